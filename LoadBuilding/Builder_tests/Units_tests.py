@@ -0,0 +1,802 @@
+"""
+
+This file provides unit tests of the searches of loads of the LoadBuilder (bounds, masks of configurations,
+packing cache, selection of loads and skyline packers). Searches are compared with brute force ones on small
+random instances.
+
+Run with : python -m pytest Units_tests.py (or python Units_tests.py)
+
+"""
+import sys
+import os
+import unittest
+import pandas as pd
+from collections import Counter
+from copy import deepcopy as dc
+from itertools import combinations
+from random import Random
+from unittest.mock import patch
+
+# Import LoadBuilding modules
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import skyline as S
+import LoadingObjects as LoadObj
+from LoadBuilder import LoadBuilder, set_trailer_reference, pack_config, config_of_mask, evaluate_configs, \
+    class_masks, class_prefixes, trie_position, nb_of_configs, select_loads
+from LoadingObjects import PackingCache
+from bounds import score_upperbound
+
+# Import Load_Process modules (they need pyodbc to reach SQL databases)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+                                'Load_Process'))
+try:
+    import P2PFunctions as P2P
+except ImportError:
+    P2P = None
+
+trailers_dims = [(98, 630, 0), (102, 576, 51.5), (102, 636, 0)]
+score_multiplication_base = 1.20
+
+# Models used to build random loads (name, length, width, height, number per crate, stack limit, overhang, type)
+models_dims = [('VT', 90, 51, 50, 1, 2, 1, 'W'), ('VTL', 97, 51, 50, 1, 2, 1, 'W'), ('VTW', 99, 56, 51, 1, 2, 1, 'W'),
+               ('VTY', 91, 56, 51, 1, 2, 1, 'W'), ('VTZ', 126, 56, 50, 1, 2, 1, 'W'),
+               ('VCC', 126, 68, 49, 1, 2, 1, 'W'), ('MAV', 126, 75, 49, 1, 2, 1, 'W'),
+               ('VCY', 126, 75, 50, 1, 1, 0, 'W'), ('SP2', 98, 90, 35, 2, 3, 0, 'W'), ('MT1', 60, 45, 40, 1, 3, 0, 'M'),
+               ('MT2', 80, 48, 40, 1, 2, 0, 'M'), ('MT3', 45, 40, 30, 1, 4, 0, 'M'),
+               ('X3M', 172, 82, 52, 1, 2, 1, 'W'), ('VCS', 138, 80, 51, 1, 2, 1, 'W')]
+
+
+def random_footprints(rand, nb_of_stacks):
+
+    """
+    Returns footprints of random stacks (see stacks_dimensions) and their number of mandatory crates
+    """
+    footprints = [(rand.choice([40, 45, 48, 51, 56, 68, 75, 82]), rand.choice([45, 60, 80, 97, 126, 138, 172]),
+                   rand.random() < 0.3, rand.random() < 0.7) for _ in range(nb_of_stacks)]
+    mandatory = [rand.choice([0, 0, 1, 2]) for _ in range(nb_of_stacks)]
+
+    return footprints, mandatory
+
+
+def random_options(rand, footprints, trailer_dims, nb_of_options):
+
+    """
+    Returns rotation values allowed for the first stacks (the orientations kept fit in the trailer as in
+    LoadBuilder.__rotation_options, two values are allowed when both fit and the stack can be rotated)
+    """
+    options = []
+    for stack_width, stack_length, _, rotation in footprints[:nb_of_options]:
+        if stack_length > trailer_dims[0]:
+            options.append((False,))
+        elif rotation:
+            options.append((False, True))
+        else:
+            options.append((rand.random() < 0.5,))
+
+    return options
+
+
+def trailer_bin(footprints, trailer_dims, config):
+
+    """
+    Returns the bin of the trailer packed by pack_config
+    """
+    return pack_config(footprints, range(len(footprints)), trailer_dims, config)[0]
+
+
+def load_score(bin, mandatory):
+
+    """
+    Returns the score of the load packed in the bin (used area boosted by mandatory crates)
+    """
+    return bin.used_area() * score_multiplication_base**sum(mandatory[rect.rid] for rect in bin)
+
+
+def random_build_data(seed):
+
+    """
+    Returns random models, trailers, ranking and maximal number of loads to give to LoadBuilder.build
+    """
+    rand = Random(seed)
+    rows = []
+    for name, length, width, height, nb_per_crate, stack_limit, overhang, crate_type in \
+            rand.sample(models_dims, rand.randint(3, 8)):
+        qty = rand.randint(1, 14)
+        rows.append([qty, name, length, width, height, nb_per_crate, crate_type, stack_limit,
+                     rand.randint(0, qty // 2), overhang, rand.random() < 0.5])
+
+    models = pd.DataFrame(rows, columns=['QTY', 'MODEL', 'LENGTH', 'WIDTH', 'HEIGHT', 'NBR_PER_CRATE', 'CRATE_TYPE',
+                                         'STACK_LIMIT', 'NB_OF_X', 'OVERHANG', 'ROTATION'])
+    ranking = {row[1]: [rand.randint(1, 50) for _ in range(row[0])] for row in rows}
+    trailers = pd.DataFrame([[rand.randint(0, 2), 'DRYBOX', 630, 98, 105, 0],
+                             [rand.randint(1, 3), 'FLATBED_48', 576, 102, 105, 1],
+                             [rand.randint(0, 2), 'FLATBED_53', 636, 102, 105, 0]],
+                            columns=['QTY', 'CATEGORY', 'LENGTH', 'WIDTH', 'HEIGHT', 'OVERHANG'])
+
+    return models, trailers, ranking, rand.randint(1, 4)
+
+
+def random_build(seed, **settings):
+
+    """
+    Builds the loads of random data with the LoadBuilder settings given and returns the LoadBuilder and the loads
+    """
+    models, trailers, ranking, max_load = random_build_data(seed)
+    set_trailer_reference(pd.DataFrame([[576, 102, 105, 51.5]], columns=['LENGTH', 'WIDTH', 'HEIGHT', 'OVERHANG']))
+    lb = LoadBuilder(trailers)
+    for setting, value in settings.items():
+        setattr(lb, setting, value)
+    result = lb.build(models, max_load, ranking=ranking)
+
+    return lb, result
+
+
+def loads_done(lb):
+
+    """
+    Returns what can be observed of the trailers packed by a LoadBuilder
+    """
+    return [(trailer.category, trailer.crate_type, round(float(trailer.score), 4), trailer.length_used,
+             sorted((rect.x, rect.y, rect.width, rect.height) for rect in trailer.packer[0]),
+             sorted(trailer.load_summary().items())) for trailer in lb.trailers_done]
+
+
+class BoundsTests(unittest.TestCase):
+
+    def test_score_upperbound_beats_all_configurations(self):
+
+        rand = Random(0)
+        for _ in range(40):
+            footprints, mandatory = random_footprints(rand, rand.randint(1, 8))
+            trailer_dims = rand.choice(trailers_dims)
+            options = random_options(rand, footprints, trailer_dims, len(footprints))
+
+            bound = score_upperbound(footprints, mandatory, trailer_dims, score_multiplication_base, options)
+            best = max(load_score(trailer_bin(footprints, trailer_dims, config_of_mask(options, mask)), mandatory)
+                       for mask in range(2**sum(len(option) - 1 for option in options)))
+
+            self.assertGreaterEqual(bound * (1 + 1e-9), best)
+
+
+class ConfigurationsTests(unittest.TestCase):
+
+    @staticmethod
+    def random_classes(rand, nb_of_bits):
+
+        """
+        Returns classes of stacks (see class_masks) grouping random bits
+        """
+        groups = {}
+        for i in range(nb_of_bits):
+            groups.setdefault(rand.randint(0, max(nb_of_bits // 2, 1)), []).append(1 << i)
+
+        return sorted(groups.values())
+
+    def test_class_masks_without_symmetry_are_all_masks_in_trie_order(self):
+
+        for nb_of_bits in range(7):
+            masks = list(class_masks([[1 << i] for i in range(nb_of_bits)]))
+            self.assertEqual([trie_position(mask, nb_of_bits) for mask in masks], list(range(2**nb_of_bits)))
+
+    def test_class_masks_rotate_the_first_stacks_of_each_class(self):
+
+        rand = Random(1)
+        for _ in range(30):
+            nb_of_bits = rand.randint(0, 8)
+            classes = self.random_classes(rand, nb_of_bits)
+
+            # The brute force keeps the masks where the rotated stacks of each class are its first ones
+            expected = [mask for mask in range(2**nb_of_bits)
+                        if all(bits[:sum(bool(mask & bit) for bit in bits)] == [bit for bit in bits if mask & bit]
+                               for bits in classes)]
+            masks = list(class_masks(classes))
+
+            self.assertEqual(sorted(masks), expected)
+            self.assertEqual(len(masks), nb_of_configs(classes))
+            positions = [trie_position(mask, nb_of_bits) for mask in masks]
+            self.assertEqual(positions, sorted(positions))
+
+    def test_class_prefixes_split_the_masks_in_order(self):
+
+        rand = Random(2)
+        for _ in range(30):
+            classes = self.random_classes(rand, rand.randint(0, 8))
+            prefixes = class_prefixes(classes, rand.randint(1, 20))
+            self.assertEqual([mask for prefix in prefixes for mask in class_masks(classes, prefix)],
+                             list(class_masks(classes)))
+
+    def test_evaluate_configs_gives_the_packings_of_pack_config(self):
+
+        rand = Random(3)
+        for _ in range(20):
+            footprints, _ = random_footprints(rand, rand.randint(1, 9))
+            trailer_dims = rand.choice(trailers_dims)
+            options = random_options(rand, footprints, trailer_dims, rand.randint(1, len(footprints)))
+            nb_of_bits = sum(len(option) - 1 for option in options)
+            masks = list(class_masks([[1 << i] for i in range(nb_of_bits)]))
+
+            results, deadline_reached = evaluate_configs(footprints, trailer_dims, options, masks, 55)
+
+            self.assertFalse(deadline_reached)
+            self.assertEqual([mask for mask, _ in results], masks)
+            for mask, (positions, used_area, covered_length) in results:
+                bin = trailer_bin(footprints, trailer_dims, config_of_mask(options, mask))
+                self.assertEqual(positions, tuple(rect.rid for rect in bin))
+                self.assertEqual(used_area, bin.used_area())
+                self.assertEqual(covered_length, bin.covered_length(55))
+
+
+class WarehouseTests(unittest.TestCase):
+
+    @staticmethod
+    def random_stack(rand):
+
+        """
+        Returns a stack of random crates of the same model
+        """
+        name, length, width, height, _, stack_limit, overhang, crate_type = rand.choice(models_dims)
+        properties = LoadObj.CrateType([name], length, width, height, stack_limit, overhang, rand.random() < 0.5,
+                                       crate_type)
+
+        return LoadObj.Stack([LoadObj.Crate(properties, rand.random() < 0.3, rand.randint(1, 50))
+                              for _ in range(rand.randint(1, stack_limit))])
+
+    def test_stacks_left_are_found_as_in_a_list(self):
+
+        rand, tombstones_seen = Random(7), False
+        for _ in range(30):
+            warehouse, stacks = LoadObj.Warehouse(), []
+            for _ in range(200):
+                operation = rand.random()
+                if operation < 0.35 or not stacks:
+                    stacks.append(self.random_stack(rand))
+                    warehouse.add_stack(stacks[-1])
+
+                elif operation < 0.6:
+                    removed = rand.sample(stacks, rand.randint(1, min(len(stacks), 4)))
+                    warehouse.remove_stacks([warehouse.get_stack_by_id(id(stack))[1] for stack in removed])
+                    stacks = [stack for stack in stacks if stack not in removed]
+                    self.assertTrue(all(warehouse.get_stack_by_id(id(stack)) is None for stack in removed))
+
+                elif operation < 0.7:
+                    decreasing_area = rand.random() < 0.5
+                    warehouse.sort_by_area(decreasing_area=decreasing_area)
+                    stacks.sort(key=lambda stack: -stack.area() if decreasing_area else stack.area())
+
+                elif operation < 0.8:
+                    indexes = rand.sample(range(len(stacks)), rand.randint(1, len(stacks)))
+                    warehouse.move_stacks_to_end(indexes)
+                    stacks = [stack for i, stack in enumerate(stacks) if i not in indexes] + \
+                             [stacks[i] for i in indexes]
+
+                else:
+                    i = rand.randrange(len(stacks))
+                    self.assertIs(warehouse[i], stacks[i])
+
+                tombstones_seen |= warehouse.nb_of_dead > 0
+                self.assertEqual(list(warehouse), stacks)
+                self.assertEqual(len(warehouse), len(stacks))
+                self.assertLessEqual(warehouse.nb_of_dead, warehouse.max_dead_fraction * len(warehouse.stacks_to_ship))
+                self.assertTrue(all(set(ranks) <= set(stacks) for ranks in warehouse.orderings.values()))
+                for stack in stacks:
+                    stack_found, index = warehouse.get_stack_by_id(id(stack))
+                    self.assertIs(stack_found, stack)
+                    self.assertIs(warehouse.stacks_to_ship[index], stack)
+
+        self.assertTrue(tombstones_seen)
+
+    def test_ranks_are_kept_when_stacks_are_removed(self):
+
+        rand, warehouse = Random(9), LoadObj.Warehouse()
+        for _ in range(20):
+            warehouse.add_stack(self.random_stack(rand))
+        warehouse.sort_by_length()
+        warehouse.sort_by_width(True)
+        ranks = warehouse.orderings[('length', False, True)]
+
+        removed = list(warehouse)[5:9]
+        warehouse.remove_stacks([warehouse.get_stack_by_id(id(stack))[1] for stack in removed])
+        view = warehouse.view({id(stack) for stack in list(warehouse)[:6]})
+        warehouse.sort_by_length()
+
+        self.assertIs(warehouse.orderings[('length', False, True)], ranks)
+        self.assertEqual(list(warehouse), sorted(warehouse, key=lambda stack: -stack.length))
+        self.assertEqual(set(ranks), set(warehouse))
+        self.assertEqual(set(view.orderings[('width', True, True)]), set(view))
+
+        # Stacks added are ranked at the next sort
+        warehouse.add_stack(self.random_stack(rand))
+        warehouse.sort_by_length()
+        self.assertEqual(list(warehouse), sorted(warehouse, key=lambda stack: -stack.length))
+
+        warehouse.save_unused_crates([])
+        self.assertEqual(warehouse.orderings[('width', True, True)], {})
+
+    def test_initialization_builds_the_stacks_of_the_row_by_row_construction(self):
+
+        models = pd.DataFrame([[7, 'VT', 90, 51, 50, 1, 'W', 2, 3, 1, False],
+                               [5, 'VTZ', 126, 56, 50, 1, 'W', 2, 0, 1, True],
+                               [9, 'SP2', 98, 90, 35, 2, 'W', 3, 2, 0, False],
+                               [0, 'VCY', 126, 75, 50, 1, 'W', 1, 0, 0, True],
+                               [4, 'X3M', 82, 172, 52, 1, 'W', 2, 1, 1, True],
+                               [11, 'MT1', 60, 45, 40, 1, 'M', 3, 4, 0, True],
+                               [6, 'MT3', 45, 40, 30, 1, 'M', 4, 0, 0, False],
+                               [3, 'VCS', 138, 80, 51, 1, 'W', 2, 0, 1, False],
+                               [5, 'VTL', 97, 51, 50, 1, 'W', 2, 1, 1, True]],
+                              columns=['QTY', 'MODEL', 'LENGTH', 'WIDTH', 'HEIGHT', 'NBR_PER_CRATE', 'CRATE_TYPE',
+                                       'STACK_LIMIT', 'NB_OF_X', 'OVERHANG', 'ROTATION'])
+        ranking = {'VT': [4, 9, 1, 7, 7, 2, 5], 'VTZ': [3, 8, 6, 1, 2], 'SP2': [5, 5, 2, 9, 1, 4, 8, 3, 7],
+                   'MT1': [2, 6, 4, 1, 9, 3, 3, 8, 5, 7, 1], 'VTL': [6, 2, 9, 4, 1]}
+
+        # Stacks built by the construction done one line of the data frame at a time (dimensions and crates from the
+        # bottom to the top, with * marking mandatory crates and followed by their ranking)
+        stacks = [(90, 51, 100, 'VT*4 VT*9'), (90, 51, 100, 'VT*1 VT:7'), (90, 51, 100, 'VT:7 VT:2'),
+                  (126, 56, 100, 'VTZ:3 VTZ:8'), (126, 56, 100, 'VTZ:6 VTZ:1'), (98, 90, 105, 'SP2*5 SP2*5 SP2:2'),
+                  (172, 82, 104, 'X3M*0 X3M:0'), (172, 82, 104, 'X3M:0 X3M:0'), (138, 80, 102, 'VCS:0 VCS:0'),
+                  (97, 51, 100, 'VTL*6 VTL:2'), (97, 51, 100, 'VTL:9 VTL:4')]
+        metal_stacks = [(60, 45, 120, 'MT1*2 MT1*6 MT1*4'), (60, 45, 120, 'MT1*1 MT1:9 MT1:3'),
+                        (60, 45, 120, 'MT1:3 MT1:8 MT1:5'), (45, 40, 120, 'MT3:0 MT3:0 MT3:0 MT3:0')]
+        expected = {False: (stacks, metal_stacks,
+                            [('MT1', 'M'), ('MT1', 'M'), ('MT3', 'M'), ('MT3', 'M'), ('SP2', 'W'), ('SP2', 'W'),
+                             ('VCS', 'W'), ('VT', 'W'), ('VTL', 'W'), ('VTZ', 'W')]),
+                    True: (stacks + [(98, 90, 35, 'SP2:9'), (138, 80, 51, 'VCS:0'), (126, 56, 100, 'VTZ:2 VTL:1'),
+                                     (90, 51, 50, 'VT:5')],
+                           metal_stacks + [(60, 45, 80, 'MT1:7 MT1:1'), (45, 40, 60, 'MT3:0 MT3:0')], [])}
+
+        for patching_activated in (False, True):
+            lb = LoadBuilder(pd.DataFrame(columns=['QTY', 'CATEGORY', 'LENGTH', 'WIDTH', 'HEIGHT', 'OVERHANG']))
+            lb.patching_activated = patching_activated
+            lb._LoadBuilder__warehouse_init(models, ranking)
+            lb._LoadBuilder__prepare_warehouse()
+
+            observed = tuple([(stack.length, stack.width, stack.height,
+                               ' '.join('{}{}{}'.format(crate.model_names[0], '*' if crate.mandatory else ':',
+                                                        crate.ranking) for crate in stack.crates))
+                              for stack in warehouse] for warehouse in (lb.warehouse, lb.metal_warehouse))
+            self.assertEqual(observed + (sorted(lb.unused_models),), expected[patching_activated])
+
+    def test_copies_find_their_own_stacks(self):
+
+        rand, warehouse = Random(8), LoadObj.Warehouse()
+        for _ in range(10):
+            warehouse.add_stack(self.random_stack(rand))
+        warehouse.remove_stacks([2])
+
+        copy = dc(warehouse)
+        copy.remove_stacks([copy.get_stack_by_id(id(stack))[1] for stack in list(copy)[:3]])
+
+        self.assertEqual(len(warehouse), 9)
+        self.assertEqual(len(copy), 6)
+        self.assertTrue(all(copy.get_stack_by_id(id(stack))[0] is stack for stack in copy))
+        self.assertTrue(all(copy.get_stack_by_id(id(stack)) is None for stack in warehouse))
+
+
+class StackTests(unittest.TestCase):
+
+    def test_model_counts_are_the_counts_of_the_models(self):
+
+        rand = Random(10)
+        warehouse, trailer = LoadObj.Warehouse(), LoadObj.Trailer('FLATBED_48', 576, 102, 105, 0, 51.5)
+        for _ in range(40):
+            stack = WarehouseTests.random_stack(rand)
+            for _ in range(rand.randint(0, 2)):
+                name, length, width, height, nb_per_crate, stack_limit, overhang, crate_type = rand.choice(models_dims)
+                properties = LoadObj.CrateType([name] * nb_per_crate, length, width, height, stack_limit, overhang,
+                                               False, crate_type)
+                stack.add_crate(LoadObj.Crate(properties, False, 0))
+
+            self.assertEqual(stack.model_counts, Counter(stack.models))
+            self.assertEqual(sum(stack.model_counts.values()), stack.nb_of_units)
+            if rand.random() < 0.5:
+                warehouse.add_stack(stack)
+            else:
+                trailer.add_stack(stack)
+
+        expected = [(model, stack.crates_type) for stack in warehouse for model in stack.models]
+        unused = []
+        warehouse.save_unused_crates(unused)
+        self.assertEqual(Counter(unused), Counter(expected))
+
+        self.assertEqual(trailer.load_summary(), Counter(model for stack in trailer.load for model in stack.models))
+
+
+class PackingCacheTests(unittest.TestCase):
+
+    def test_least_recently_used_result_is_removed(self):
+
+        cache = PackingCache(2)
+        cache.add('a', 1)
+        cache.add('b', 2)
+        self.assertEqual(cache.get('a'), 1)
+        cache.add('c', 3)
+
+        self.assertEqual(len(cache), 2)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('a'), 1)
+        self.assertEqual(cache.get('c'), 3)
+        self.assertEqual((cache.hits, cache.misses), (3, 1))
+
+    def test_clear_keeps_the_counters(self):
+
+        cache = PackingCache(5)
+        cache.add('a', 1)
+        cache.get('a')
+        cache.get('b')
+        cache.clear()
+
+        self.assertEqual(len(cache), 0)
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual((cache.hits, cache.misses), (1, 2))
+
+
+class SelectLoadsTests(unittest.TestCase):
+
+    def test_select_loads_is_optimal_on_small_instances(self):
+
+        rand = Random(4)
+        for _ in range(60):
+            nb_of_stacks = rand.randint(1, 8)
+            capacities = {'DRYBOX': rand.randint(0, 3), 'FLATBED_48': rand.randint(0, 3)}
+            loads = sorted([(rand.randint(1, 100) * 1000.0, rand.choice(list(capacities)),
+                             frozenset(rand.sample(range(nb_of_stacks), rand.randint(1, nb_of_stacks))))
+                            for _ in range(rand.randint(0, 8))], key=lambda load: load[0], reverse=True)
+            max_nb_of_loads = rand.randint(1, 4)
+
+            # The brute force tries every subset of disjoint loads respecting the capacities
+            best = 0
+            for nb_of_loads in range(1, min(max_nb_of_loads, len(loads)) + 1):
+                for selection in combinations(loads, nb_of_loads):
+                    ids = [i for _, _, load_ids in selection for i in load_ids]
+                    if len(ids) == len(set(ids)) and \
+                            all(sum(load[1] == c for load in selection) <= capacities[c] for c in capacities):
+                        best = max(best, sum(score for score, _, _ in selection))
+
+            selected = select_loads(loads, capacities, max_nb_of_loads, 10**6)
+
+            self.assertEqual(sum(loads[i][0] for i in selected), best)
+            self.assertLessEqual(len(selected), max_nb_of_loads)
+            self.assertTrue(all(loads[i][2].isdisjoint(loads[j][2]) for i, j in combinations(selected, 2)))
+
+
+class SkylineTests(unittest.TestCase):
+
+    def test_height_tree_queries_match_brute_force(self):
+
+        rand = Random(5)
+        for width in (1, 2, 7, 16, 37, 102):
+            tree, tops = S.HeightTree(width), [0] * width
+            for _ in range(300):
+                start = rand.randrange(width)
+                end = rand.randint(start + 1, width)
+                if rand.random() < 0.5:
+                    top = rand.choice([rand.randint(0, 600), rand.random() * 600])
+                    tree.raise_interval(start, end, top)
+                    tops[start:end] = [max(t, top) for t in tops[start:end]]
+                else:
+                    self.assertEqual(tree.max(start, end), max(tops[start:end]))
+
+            copy = tree.copy()
+            copy.raise_interval(0, width, 10**6)
+            self.assertEqual(tree.max(0, width), max(tops))
+
+    @staticmethod
+    def random_packing(pack_algo, seed, floats):
+
+        """
+        Packs random rectangles (with checkpoints restored along the way) and returns what can be observed
+        """
+        rand = Random(seed)
+        width, length, oh = rand.choice(trailers_dims)
+        if floats:
+            width, length = rand.choice([101.5, 99.25, width - rand.random() * 4]), length + rand.random() * 10
+        bin = pack_algo(width, length, rot=rand.random() < 0.5, overhang=oh)
+        observed, states = [], []
+
+        for rid in range(rand.randint(5, 40)):
+            w = rand.choice([40, 45, 48, 51, 56, 68, 75, 82, 90]) + (rand.random() * 10 if floats else 0)
+            l = rand.choice([45, 60, 80, 90, 97, 126, 138, 172]) + (rand.random() * 10 if floats else 0)
+            if rand.random() < 0.1:
+                states.append(bin.checkpoint())
+            if states and rand.random() < 0.05:
+                bin.restore(states.pop())
+
+            rect = bin.add_rect(w, l, rid, rand.random() < 0.3, rand.random() < 0.5)
+            observed.append(None if rect is None else (rect.x, rect.y, rect.width, rect.height, rect.rid))
+            observed.append((bin.fitness(50, 60, False, True), bin.covered_length(55), bin.free_area(40, 40, True)))
+
+        observed.append(bin.used_area())
+
+        return observed
+
+    def test_array_and_tree_skylines_place_as_the_skyline(self):
+
+        for reference, packers in ((S.SkylineBlWm, (S.ArraySkylineBlWm, S.TreeSkylineBlWm)),
+                                   (S.SkylineBl, (S.ArraySkylineBl, S.TreeSkylineBl))):
+            for seed in range(600):
+                for floats in (False, True):
+                    expected = self.random_packing(reference, seed, floats)
+                    for pack_algo in packers:
+                        self.assertEqual(self.random_packing(pack_algo, seed, floats), expected,
+                                         (pack_algo.__name__, seed, floats))
+
+    def test_vector_placements_are_the_scalar_ones(self):
+
+        for pack_algo in (S.ArraySkylineBl, S.ArraySkylineBlWm, S.ArraySkylineMwf, S.ArraySkylineMwfl,
+                          S.ArraySkylineMwfWm, S.ArraySkylineMwflWm):
+            for seed in range(200):
+                for floats in (False, True):
+                    with patch.object(S.ArraySkyline, 'vector_threshold', float('inf')):
+                        expected = self.random_packing(pack_algo, seed, floats)
+                    with patch.object(S.ArraySkyline, 'vector_threshold', 0):
+                        self.assertEqual(self.random_packing(pack_algo, seed, floats), expected,
+                                         (pack_algo.__name__, seed, floats))
+
+    def test_tree_skyline_packs_surfaces_of_any_width(self):
+
+        rand = Random(6)
+        for _ in range(50):
+            width = rand.choice([101.5, 99.25, 102])
+            bins = [pack_algo(width, 600, rot=True) for pack_algo in (S.SkylineBlWm, S.TreeSkylineBlWm)]
+            for rid in range(20):
+                w, l = rand.choice([40, 51, 56.5]), rand.choice([60, 97, 126])
+                rects = [bin.add_rect(w, l, rid, False, True) for bin in bins]
+                self.assertEqual(*[None if rect is None else (rect.x, rect.y, rect.width, rect.height)
+                                   for rect in rects])
+
+
+class BranchAndBoundTests(unittest.TestCase):
+
+    def test_branch_and_bound_finds_the_load_of_the_exhaustive_search(self):
+
+        searches, branch_and_bound = [], LoadBuilder._LoadBuilder__branch_and_bound
+
+        def recorded_search(lb, crate_type, warehouse, trailer, lower_bound, options):
+            loads = branch_and_bound(lb, crate_type, warehouse, trailer, lower_bound, options)
+            candidates = lb._LoadBuilder__evaluate_configs(warehouse, trailer, lower_bound, options)
+            best = lb._LoadBuilder__qualified_load([candidates], crate_type, warehouse, trailer, lower_bound)
+            searches.append((loads, best, sum(stack.nb_of_mandatory for stack in warehouse)))
+            return loads
+
+        with patch.object(LoadBuilder, '_LoadBuilder__branch_and_bound', recorded_search):
+            for seed in range(40):
+                random_build(seed, config_search='branch_and_bound', symmetry_breaking=seed % 4 < 2,
+                             validate_with_ref=seed % 2 == 0)
+
+        self.assertTrue(any(best is not None and nb_of_mandatory > 0 for _, best, nb_of_mandatory in searches))
+        for loads, best, _ in searches:
+            if best is None:
+                self.assertEqual(loads, [])
+            else:
+                self.assertEqual([loads[0][:3]], [best[:3]])
+
+    def test_branch_and_bound_builds_the_loads_of_the_exhaustive_search(self):
+
+        for seed in range(30):
+            for symmetry_breaking in (False, True):
+                expected = loads_done(random_build(seed, symmetry_breaking=symmetry_breaking)[0])
+                self.assertEqual(loads_done(random_build(seed, config_search='branch_and_bound',
+                                                         symmetry_breaking=symmetry_breaking)[0]), expected)
+
+
+class LocalSearchTests(unittest.TestCase):
+
+    def test_local_search_returns_qualified_loads_not_worse_than_its_start(self):
+
+        searches, local_search = [], LoadBuilder._LoadBuilder__local_search
+
+        def recorded_search(lb, warehouse, trailer, lower_bound, options, deadline):
+            loads = local_search(lb, warehouse, trailer, lower_bound, options, deadline)
+            lb.local_search_iterations, iterations = 0, lb.local_search_iterations
+            start = local_search(lb, warehouse, trailer, lower_bound, options, deadline)
+            lb.local_search_iterations = iterations
+            searches.append((loads, start, trailer, lower_bound, lb.individual_width_tolerance))
+            return loads
+
+        with patch.object(LoadBuilder, '_LoadBuilder__local_search', recorded_search):
+            for seed in range(12):
+                random_build(seed, config_search='local_search', local_search_iterations=30)
+
+        self.assertTrue(any(loads for loads, _, _, _, _ in searches))
+        for loads, start, trailer, lower_bound, width_tolerance in searches:
+            self.assertEqual([load[0] for load in loads], sorted([load[0] for load in loads], reverse=True))
+            if start:
+                self.assertGreaterEqual(loads[0][0], start[0][0])
+
+            # Loads found are qualified and their packer gives the stacks and the length covered recorded
+            for score, covered_length, ids, packer, _ in loads:
+                bin = packer()[0]
+                self.assertGreaterEqual(covered_length, lower_bound * trailer.length)
+                self.assertEqual(sorted(rect.rid for rect in bin), sorted(ids))
+                self.assertEqual(bin.covered_length(width_tolerance), covered_length)
+                self.assertGreaterEqual(score, bin.used_area())
+
+
+class BoundTerminationTests(unittest.TestCase):
+
+    def test_searches_stopped_early_find_the_best_score(self):
+
+        searches, search_loads = [], LoadBuilder._LoadBuilder__search_loads
+
+        def recorded_search(lb, loads, crate_type, warehouse, trailer, lower_bound, sort_choice=0, deadline=None):
+
+            # We only compare the searches started by the builds (not the ones of the next sort options)
+            if sort_choice != 0:
+                return search_loads(lb, loads, crate_type, warehouse, trailer, lower_bound, sort_choice, deadline)
+
+            complete_loads, view = [], warehouse.view({id(stack) for stack in warehouse})
+            search_loads(lb, loads, crate_type, warehouse, trailer, lower_bound)
+            lb.bound_termination = False
+            search_loads(lb, complete_loads, crate_type, view, trailer, lower_bound)
+            lb.bound_termination = True
+
+            searches.append([lb._LoadBuilder__qualified_load(found, crate_type, warehouse, trailer, lower_bound)
+                             for found in (loads, complete_loads)])
+
+        with patch.object(LoadBuilder, '_LoadBuilder__search_loads', recorded_search):
+            for seed in range(30):
+                random_build(seed, bound_termination=True)
+
+        self.assertTrue(any(load is not None for load, _ in searches))
+        for load, complete_load in searches:
+            self.assertEqual(load is None, complete_load is None)
+            if load is not None:
+                self.assertEqual(load[0], complete_load[0])
+
+class SanityCheckTests(unittest.TestCase):
+
+    @staticmethod
+    def copy_check(lb, crate_type, warehouse, warehouse_used_ids):
+
+        """
+        Returns the result of the sanity check done on a copy of the warehouse with the stacks used only
+        (as it was done before the views, the prefilter and the saved results)
+        """
+        t = dc(LoadBuilder.trailer_reference)
+        lowerbound = round((lb.plc_lb*t.length)/lb.max_trailer_length, 4)
+        t.length = lb.max_trailer_length
+
+        w = dc(warehouse)
+        w.remove_stacks([index for index, stack in enumerate(warehouse.stacks_to_ship)
+                         if stack is not None and id(stack) not in warehouse_used_ids])
+
+        loads = []
+        lb._LoadBuilder__search_loads(loads, crate_type, w, t, lowerbound)
+
+        return lb._LoadBuilder__qualified_load(loads, crate_type, w, t, lowerbound) is not None
+
+    def recorded_checks(self, seeds):
+
+        """
+        Builds random loads validated with the reference trailer and returns, for the stacks of each load checked and
+        for parts of them, the result of the sanity check, the result of the prefilter and the result of the check
+        done on a copy of the warehouse
+        """
+        checks, sanity_check = [], LoadBuilder._LoadBuilder__sanity_check
+
+        def recorded_check(lb, crate_type, warehouse, warehouse_used_ids):
+            ref = LoadBuilder.trailer_reference
+            t = LoadObj.Trailer(cat=ref.category, l=lb.max_trailer_length, w=ref.width, h=ref.height, p=ref.priority,
+                                oh=ref.oh)
+            lowerbound = round((lb.plc_lb*ref.length)/t.length, 4)
+            ids = list(warehouse_used_ids)
+            for part in (ids, ids[::2], ids[1::2], ids[:-1], ids[:len(ids)*3//4]):
+                prefilter = lb._LoadBuilder__sanity_prefilter(warehouse.view(set(part)), t, lowerbound)
+                checks.append((sanity_check(lb, crate_type, warehouse, part), prefilter,
+                               self.copy_check(lb, crate_type, warehouse, set(part))))
+
+            return sanity_check(lb, crate_type, warehouse, warehouse_used_ids)
+
+        with patch.object(LoadBuilder, '_LoadBuilder__sanity_check', recorded_check):
+            for seed in seeds:
+                random_build(seed, validate_with_ref=True)
+
+        return checks
+
+    def test_prefilter_only_rejects_loads_failing_the_check(self):
+
+        checks = self.recorded_checks(range(0, 60, 2))
+
+        self.assertTrue(any(prefilter is False for _, prefilter, _ in checks))
+        for _, prefilter, expected in checks:
+            self.assertIn(prefilter, (False, None))
+            if prefilter is False:
+                self.assertFalse(expected)
+
+    def test_saved_results_on_views_are_the_results_on_copies(self):
+
+        checks = self.recorded_checks(range(1, 80, 2))
+
+        self.assertTrue(any(result for result, _, _ in checks) and not all(result for result, _, _ in checks))
+        for result, _, expected in checks:
+            self.assertEqual(result, expected)
+
+
+@unittest.skipIf(P2P is None, 'P2PFunctions needs pyodbc')
+class P2PTests(unittest.TestCase):
+
+    # Dimensions of the trailers returned instead of the ones saved in SQL (length, width, height and overhang)
+    trailers_dims = {'DRYBOX': (630, 98, 105, 0), 'FLATBED_48': (576, 102, 105, 51.5), 'FLATBED_53': (636, 102, 105, 0)}
+
+    @classmethod
+    def trailers_data(cls, category_list=[], qty_list=[]):
+
+        """
+        Returns the trailers data frame that get_trailers_data would return
+        """
+        return pd.DataFrame([[qty, category] + list(cls.trailers_dims[category])
+                             for category, qty in zip(category_list, qty_list)],
+                            columns=['QTY', 'CATEGORY', 'LENGTH', 'WIDTH', 'HEIGHT', 'OVERHANG'])
+
+    def random_p2ps(self, seed):
+
+        """
+        Returns random wishes, inventory and p2ps. The p2ps from the sharing points are coupled, as the p2ps from A and
+        from B (A includes the inventory of B), while the p2ps from C and from D are independent.
+        """
+        rand = Random(seed)
+        P2P.reset_flatbed_53()
+        P2P.reset_residuals_counter()
+        P2P.DATAInclude[:] = [P2P.NestedSourcePoints('A', 'B')]
+        today = P2P.weekdays(0)
+
+        p2ps, wishes, inventory = [], [], []
+        for point_from, point_to in (('4100', 'T1'), ('4125', 'T2'), ('A', 'T3'), ('B', 'T4'), ('C', 'T3'),
+                                     ('D', 'T5')):
+            loadmin = rand.randint(0, 2)
+            p2ps.append(P2P.Parameters(point_from, point_to, loadmin, loadmin + rand.randint(0, 2), rand.randint(0, 2),
+                                       rand.randint(1, 3), 1, 1, 0))
+
+            for name, length, width, height, nb_per_crate, stack_limit, overhang, crate_type in \
+                    rand.sample(models_dims, rand.randint(2, 5)):
+                material = point_from + name
+                inventory.append(P2P.INVObj(point_from, material, rand.randint(0, 40), today, 'A'))
+                for _ in range(rand.randint(1, 12)):
+                    wishes.append(P2P.Wish(len(wishes), 10, 1, point_from, point_to, 'D', material, name, length,
+                                           width, height, stack_limit, nb_per_crate, rand.randint(1, 50),
+                                           rand.choice(['X', '']), overhang, crate_type, today, 1, 1,
+                                           rand.choice(['A', 'N'])))
+
+        return wishes, inventory, p2ps
+
+    def observed_process(self, seed, nb_of_build_processes):
+
+        """
+        Builds the loads of random p2ps as in the full process and returns what can be observed
+        """
+        wishes, inventory, p2ps = self.random_p2ps(seed)
+        P2P.set_nb_of_build_processes(nb_of_build_processes)
+        P2P.log_file = P2P.LogBuffer()
+        LoadBuilder.validate_with_ref, LoadBuilder.patching_activated = True, False
+
+        P2P.perfect_match_loads_construction(p2ps, P2P.find_perfect_match(wishes, inventory, p2ps))
+        P2P.satisfy_max_or_min(wishes, inventory, p2ps, satisfy_min=True)
+        P2P.satisfy_max_or_min(wishes, inventory, p2ps, satisfy_min=False)
+        P2P.distribute_leftovers(wishes, inventory, p2ps)
+
+        return ([(loads_done(p2p.LoadBuilder), p2p.LoadBuilder.unused_models,
+                  p2p.LoadBuilder.trailers_data.values.tolist(), p2p.LOADMAX,
+                  [wish.SALES_DOCUMENT_NUMBER for wish in p2p.AssignedWish]) for p2p in p2ps],
+                [wish.QUANTITY for wish in wishes], [inv.QUANTITY for inv in inventory], P2P.residuals_counter,
+                P2P.shared_flatbed_53, P2P.log_file.lines)
+
+    def test_builds_in_processes_give_the_serial_results(self):
+
+        set_trailer_reference(pd.DataFrame([[576, 102, 105, 51.5]], columns=['LENGTH', 'WIDTH', 'HEIGHT', 'OVERHANG']))
+        settings = P2P.load_builder_settings()
+        try:
+            with patch.object(P2P, 'get_trailers_data', self.trailers_data):
+                self.assertEqual(P2P.p2p_chains(self.random_p2ps(0)[2]), [[0, 1], [2, 3], [4], [5]])
+                for seed in range(3):
+                    expected = self.observed_process(seed, 1)
+                    self.assertTrue(any(loads for loads, _, _, _, _ in expected[0]))
+                    self.assertEqual(self.observed_process(seed, 2), expected)
+        finally:
+            P2P.terminate_build_pool()
+            P2P.set_nb_of_build_processes(1)
+            P2P.DATAInclude.clear()
+            for name, value in settings.items():
+                setattr(LoadBuilder, name, value)
+
+
+if __name__ == '__main__':
+    unittest.main()
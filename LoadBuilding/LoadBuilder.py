@@ -8,13 +8,21 @@ Last update : 2019-10-31
 By : Nicolas Raymond
 
 """
+import atexit
 import numpy as np
 import LoadingObjects as LoadObj
 import pandas as pd
 from collections import Counter
 from packer import newPacker
-from math import floor
-from copy import deepcopy as dc
+from skyline import SkylineBlWm
+from bounds import score_upperbound, mandatory_upperbound, orientations
+from math import floor, exp
+from functools import partial
+from random import Random
+from time import time
+from multiprocessing import Pool
+
+workers_pool = None  # Tuple with the number of workers and the pool of processes (created when needed)
 
 
 class LoadBuilder:
@@ -30,6 +38,22 @@ class LoadBuilder:
     max_trailer_length = 636  # Maximum load length possible
     plc_lb = 0.80  # Lowest percentage of trailer's length that must be covered (using validation length)
     individual_width_tolerance = 55  # Smallest width tolerated for a lonely crate (without anything by his side)
+    config_search = 'exhaustive'  # Search of configurations among 'exhaustive', 'branch_and_bound' and 'local_search'
+    nb_of_workers = 1  # Number of processes used to evaluate exhaustive configurations (1 = no parallel evaluation)
+    chunks_per_worker = 4  # Number of chunks of configurations sent to each worker during parallel evaluation
+    packing_cache_size = 5000  # Maximal number of packing results kept in memory during a build
+    keep_candidates = False  # Keeps candidate loads that don't use stacks of the last trailer packed (approximate)
+    sort_portfolio = False  # Tries all sort options (concurrently if nb_of_workers > 1) and keeps the best load
+    portfolio_time_budget = None  # Seconds allowed to the sort options of the portfolio for a trailer (None = no limit)
+    build_time_budget = None  # Seconds allowed to a build, the best loads found are kept after it (None = no limit)
+    symmetry_breaking = False  # Only rotates the first stacks of each group of identical stacks (how many are rotated)
+    local_search_iterations = 300  # Maximal number of moves tried by the local search for a trailer and a sort option
+    local_search_time_budget = 1.0  # Seconds allowed to the local search for a trailer (shared by the sort options)
+    bound_termination = False  # Stops the search of a trailer as soon as a load reaches the upper bound of the score
+    trailer_selection = 'greedy'  # Selection of the loads to pack, one among 'greedy' and 'set_packing'
+    set_packing_pool_size = 20  # Maximal number of candidate loads pooled for each trailer category and crate type
+    set_packing_nodes = 10000  # Maximal number of nodes explored to select a set of disjoint loads
+    pack_algo = SkylineBlWm  # Skyline used to pack the trailers (ArraySkylineBlWm and TreeSkylineBlWm are faster)
 
     def __init__(self, trailers_data):
         """
@@ -52,6 +76,11 @@ class LoadBuilder:
         self.metal_warehouse, self.metal_remaining_crates = LoadObj.Warehouse(), LoadObj.CratesManager()
         self.trailers, self.trailers_done, self.unused_models = [], [], []
         self.all_size_codes = set()
+        self.packing_cache = LoadObj.PackingCache(self.packing_cache_size)
+        self.sanity_checks = {}  # Results of the sanity checks done during the build (by crate type and stacks used)
+        self.deadline = None  # Moment (in seconds since epoch) at which the actual build must end
+        self.build_complete = True  # Indicates if the last build was done without being narrowed by its deadline
+        self.packing_time = [0, 0]  # Seconds spent and number of configurations packed (to estimate searches time)
 
     def __len__(self):
         return len(self.trailers_done)
@@ -67,102 +96,72 @@ class LoadBuilder:
         :param ranking: dictionary with size code as keys and lists of integers as value
         """
 
-        # For all lines of the data frame
-        for i in models_data.index:
-
-            # We save the quantity of the model and the plant_to
-            qty = models_data['QTY'][i]
-
-            if qty > 0:
-
-                # We save the crate type
-                crate_type = models_data['CRATE_TYPE'][i]
-
-                # We save the name of the model
-                for j in range(qty):
-                    self.model_names.append((models_data['MODEL'][i], crate_type))
-
-                # We save the stack limit
-                stack_limit = models_data['STACK_LIMIT'][i]
-
-                # We save the number of models per crate
-                nbr_per_crate = models_data['NBR_PER_CRATE'][i]
-
-                # We save the overhang and rotation permission indicator
-                overhang = models_data['OVERHANG'][i]
-                rotation = models_data['ROTATION'][i]
-
-                # We compute the number of models per stack
-                items_per_stack = stack_limit * nbr_per_crate
-
-                # We compute the number of stacks that we can build
-                nbr_stacks = int(np.floor(qty / items_per_stack))
-
-                # We save the crate type
-                crate_type = models_data['CRATE_TYPE'][i]
-
-                # We save the number of MANDATORY crates if it's available in the input data frame
-                if 'NB_OF_X' in models_data.columns:
-                    total_of_mandatory = int(models_data['NB_OF_X'][i])
-                else:
-                    total_of_mandatory = 0
-
-                # We save the number of individual crates to build and convert it into
-                # integer to avoid conflict with range function. Also, with int(), every number in [0,1[ will
-                # be convert as 0. This way, no individual crate of SP2 will be build if there's less than 2 SP2 left
-                nbr_individual_crates = int((qty - (items_per_stack * nbr_stacks)) / nbr_per_crate)
+        # We save the columns of the data frame as arrays (only for the lines with models to ship, the others
+        # might have no stack limit or number per crate)
+        to_ship = models_data['QTY'].to_numpy() > 0
+        qty = models_data['QTY'].to_numpy()[to_ship]
+        models = models_data['MODEL'].to_numpy()[to_ship]
+        crate_types = models_data['CRATE_TYPE'].to_numpy()[to_ship]
+        stack_limits = models_data['STACK_LIMIT'].to_numpy()[to_ship]
+        nbr_per_crate = models_data['NBR_PER_CRATE'].to_numpy()[to_ship]
+        heights = models_data['HEIGHT'].to_numpy()[to_ship]
+        overhangs = models_data['OVERHANG'].to_numpy()[to_ship]
+        rotations = models_data['ROTATION'].to_numpy()[to_ship]
+
+        # We save the number of MANDATORY crates if it's available in the input data frame
+        if 'NB_OF_X' in models_data.columns:
+            total_of_mandatory = models_data['NB_OF_X'].to_numpy()[to_ship].astype(int)
+        else:
+            total_of_mandatory = np.zeros(len(qty), dtype=int)
 
-                # We compute length and width
-                if rotation:
-                    length = max(models_data['LENGTH'][i], models_data['WIDTH'][i])
-                    width = min(models_data['WIDTH'][i], models_data['LENGTH'][i])
-                else:
-                    length = models_data['LENGTH'][i]
-                    width = models_data['WIDTH'][i]
+        # We compute the length and the width of the crates (the length is the longest side if they can rotate)
+        lengths, widths = models_data['LENGTH'].to_numpy()[to_ship], models_data['WIDTH'].to_numpy()[to_ship]
+        lengths, widths = np.where(rotations, np.maximum(lengths, widths), lengths),\
+            np.where(rotations, np.minimum(lengths, widths), widths)
 
-                crates_component = [[models_data['MODEL'][i]] * nbr_per_crate,
-                                    length, width, models_data['HEIGHT'][i],
-                                    stack_limit, overhang, rotation]
+        # We compute the number of models per stack and the number of stacks that we can build for every model
+        items_per_stack = stack_limits * nbr_per_crate
+        nbr_stacks = np.floor(qty / items_per_stack).astype(int)
 
-                # We select the good type of storage of the stacks and crates that will be build
-                if crate_type == 'W':
-                    warehouse = self.warehouse
-                    crates_manager = self.remaining_crates
-
-                else:  # elif crate_type == 'M'
-                    warehouse = self.metal_warehouse
-                    crates_manager = self.metal_remaining_crates
+        # We compute the number of individual crates to build. With astype(int), every number in [0,1[ will
+        # be convert as 0. This way, no individual crate of SP2 will be build if there's less than 2 SP2 left
+        nbr_individual_crates = ((qty - (items_per_stack * nbr_stacks)) / nbr_per_crate).astype(int)
 
-                # We take the list of ranking associate with the size code or create one filled with 0
-                # and start an index to navigate through ranking list
-                r = ranking.get(models_data['MODEL'][i], [0]*qty)
-                index = 0
+        # For all lines of the data frame with models to ship
+        for i in range(len(qty)):
 
-                for j in range(nbr_stacks):
+            model, crate_type, stack_limit = models[i], crate_types[i], stack_limits[i]
+            nb_of_mandatory = int(total_of_mandatory[i])
 
-                    # We initialize a list that will contain all the crates needed to build the stack
-                    stack_crates = []
+            # We save the name of the model
+            self.model_names.extend([(model, crate_type)] * int(qty[i]))
 
-                    for k in range(stack_limit):
-                        crate_temp_components = dc(crates_component) + [total_of_mandatory > 0] + [r[index], crate_type]
-                        total_of_mandatory -= 1
-                        index += 1
-                        stack_crates.append(LoadObj.Crate(*crate_temp_components))
+            # We select the good type of storage of the stacks and crates that will be build
+            if crate_type == 'W':
+                warehouse = self.warehouse
+                crates_manager = self.remaining_crates
 
-                    # We build the stack and send it into the warehouse
-                    warehouse.add_stack(LoadObj.Stack(stack_crates))
+            else:  # elif crate_type == 'M'
+                warehouse = self.metal_warehouse
+                crates_manager = self.metal_remaining_crates
 
-                for j in range(nbr_individual_crates):
+            # We take the list of ranking associate with the size code or create one filled with 0
+            r = ranking.get(model, [0]*qty[i])
 
-                    # We add the missing number of mandatory crates to the stacks component list
-                    crate_temp_components = dc(crates_component) + [total_of_mandatory > 0] + [r[index], crate_type]
+            # We build all the crates of the model at once (the first ones being the mandatory crates). The crates
+            # share the same CrateType object with their dimensions and stacking properties.
+            properties = LoadObj.CrateType([model] * nbr_per_crate[i], lengths[i], widths[i], heights[i],
+                                           stack_limit, overhangs[i], rotations[i], crate_type)
+            crates = [LoadObj.Crate(properties, k < nb_of_mandatory, r[k])
+                      for k in range(nbr_stacks[i] * stack_limit + nbr_individual_crates[i])]
 
-                    # We build the crate and send it to the crates manager
-                    crates_manager.add_crate(LoadObj.Crate(*crate_temp_components))
+            # We build the stacks and send them into the warehouse
+            for j in range(nbr_stacks[i]):
+                warehouse.add_stack(LoadObj.Stack(crates[j * stack_limit:(j + 1) * stack_limit]))
 
-                    # We update the total number of mandatory left and increment the index
-                    total_of_mandatory -= 1
-                    index += 1
+            # We send the individual crates to the crates manager
+            for crate in crates[nbr_stacks[i] * stack_limit:]:
+                crates_manager.add_crate(crate)
 
     def __trailers_init(self):
 
@@ -246,9 +245,18 @@ class LoadBuilder:
         # We initialize lower bounds of length and area coverage that need to be satistied by the trailer done
         lower_bound = initial_lb
 
+        # We initialize a dictionary with the candidate loads found for each trailer category and crate type
+        # (evaluated once and then selected against the decreasing lower bounds), a dictionary with the load
+        # selected for each of them and a set with the ones that were kept after a trailer was packed
+        records, selections, outdated = {}, {}, set()
+
         # While we have not reached the lower bound of percentage covered and there's is still item available
         while lower_bound >= self.plc_lb and (len(self.warehouse) != 0 or len(self.metal_warehouse) != 0):
 
+            # We stop the loading with the trailers already packed if the deadline of the build is reached
+            if self.__deadline_reached():
+                break
+
             # We initialize a variable that will contain the name of the last category that didn't satisfied lb
             last_category = ''
 
@@ -268,8 +276,24 @@ class LoadBuilder:
                     # wooden warehouse and metal warehouse
                     for crate_type, warehouse in [('W', self.warehouse), ('M', self.metal_warehouse)]:
 
-                        # We update the packers tuple list
-                        self.__test_all_config(packers, crate_type, warehouse, t, lower_bound)
+                        # We search candidate loads if none were recorded for this category and crate type
+                        key = (t.category, crate_type)
+                        if key not in records:
+                            records[key] = []
+                            self.__search_loads(records[key], crate_type, warehouse, t, lower_bound)
+
+                        # We select the best load satisfying the actual lower bound among the candidates
+                        # (the packer is only built again if the load selected changed)
+                        load = self.__qualified_load(records[key], crate_type, warehouse, t, lower_bound)
+                        if load is None:
+                            selections[key] = (None, None)
+
+                        else:
+                            if selections.get(key, (None, None))[0] is not load:
+                                selections[key] = (load, (load[3](), crate_type, load[0]))
+
+                            # We update the packers tuple list
+                            packers.append(selections[key][1])
 
                     # We save the index of the best loading configuration that respected the constraint of plc_lb
                     best_packer, crate_type, score = self.__select_best_packer(packers)
@@ -301,9 +325,137 @@ class LoadBuilder:
                 # We pack the trailer and print the trailer
                 selected_trailer.pack(warehouse)
 
+                # We remove candidates found with the warehouse used if their selected load was using stacks of the
+                # trailer packed or if nothing was selected (their result depends on all stacks of the warehouse).
+                # If keep_candidates is True, the others still select the same load with this lower bound, but will be
+                # searched again if the lower bound decreases. This is an approximation, since a search with the
+                # stacks left could sort, merge and rotate them differently and find another load.
+                ids_packed = set(rect.rid for rect in selected_trailer.packer[0])
+                for key in list(records.keys()):
+                    load = selections.get(key, (None, None))[0]
+                    if not self.keep_candidates or (key[1] == selected_trailer.crate_type and
+                                                    (load is None or not ids_packed.isdisjoint(load[2]))):
+                        records.pop(key)
+                        selections.pop(key, None)
+                        outdated.discard(key)
+
+                    elif key[1] == selected_trailer.crate_type:
+                        outdated.add(key)
+
             else:
                 lower_bound = round(lower_bound - decreasing_step, 2)
 
+                # Candidates of the exhaustive search are kept since they all were evaluated, unless they were
+                # found before a trailer was packed (other searches were guided by the last bound)
+                if self.config_search != 'exhaustive':
+                    outdated.update(records.keys())
+
+                for key in outdated:
+                    records.pop(key)
+                    selections.pop(key, None)
+                outdated.clear()
+
+        # We remove trailer that were not used during the loading process
+        self.__remove_leftover_trailers()
+
+        # We save unused models from both warehouses
+        self.warehouse.save_unused_crates(self.unused_models)
+        self.metal_warehouse.save_unused_crates(self.unused_models)
+
+    def __pooled_trailer_packing(self, max_load, initial_lb=1.00, decreasing_step=0.02):
+
+        """
+        Performs trailer loading by selecting at once a set of disjoint loads maximizing the total score
+        (see select_loads) among a pool with the best qualified candidate loads of every trailer category and
+        crate type (found with all sort options), instead of packing the best trailer one at a time.
+        The pool is searched again with the stacks left after the loads selected are packed, or with a smaller
+        lower bound if no load can be selected.
+
+        :param max_load: maximum number of loads
+        :param initial_lb: first lower bound of length coverage that must be satisfied
+        :param decreasing_step: decrease of the lower bound when no load can be selected
+        """
+
+        # We sort trailer by the area of their surface
+        self.trailers.sort(key=lambda s: (s.priority, s.area()), reverse=True)
+
+        # We save the number of loads that can still be done in this build
+        nb_of_loads_left = max(max_load - len(self.trailers_done), 0)
+
+        # We initialize lower bounds of length and area coverage that need to be satistied by the trailer done
+        lower_bound = initial_lb
+
+        # We initialize a dictionary with the candidate loads found for each trailer category and crate type
+        records = {}
+
+        # While we have not reached the lower bound of percentage covered and there's is still item available
+        while lower_bound >= self.plc_lb and nb_of_loads_left > 0 and \
+                (len(self.warehouse) != 0 or len(self.metal_warehouse) != 0):
+
+            # We stop the loading with the trailers already packed if the deadline of the build is reached
+            if self.__deadline_reached():
+                break
+
+            # We group the trailers that are not packed by category (the first one represents the others)
+            available_trailers = {}
+            for t in self.trailers:
+                if not t.packed:
+                    available_trailers.setdefault(t.category, []).append(t)
+
+            # We build the pool with the best qualified candidate loads (using different stacks) of every trailer
+            # category and crate type, found with all sort options to get loads as diverse as possible
+            pool = []
+            for category, trailers in available_trailers.items():
+                for crate_type, warehouse in [('W', self.warehouse), ('M', self.metal_warehouse)]:
+
+                    # We search candidate loads if none were recorded for this category and crate type
+                    key = (category, crate_type)
+                    if key not in records:
+                        records[key] = []
+                        self.__race_sort_options(records[key], crate_type, warehouse, trailers[0], lower_bound)
+
+                    stacks_used = set()
+                    for load in self.__qualified_candidates(records[key], crate_type, warehouse, trailers[0],
+                                                            lower_bound):
+                        if len(stacks_used) == self.set_packing_pool_size:
+                            break
+
+                        ids = frozenset(load[2])
+                        if ids not in stacks_used:
+                            stacks_used.add(ids)
+                            pool.append((load[0], category, ids, crate_type, load))
+
+            # We select the set of disjoint loads with the best total score (the sort is stable so ties keep the
+            # order of the trailers)
+            pool.sort(key=lambda c: c[0], reverse=True)
+            selected = select_loads([(score, category, ids) for score, category, ids, _, _ in pool],
+                                    {category: len(trailers) for category, trailers in available_trailers.items()},
+                                    nb_of_loads_left, self.set_packing_nodes)
+
+            if len(selected) == 0:
+                lower_bound = round(lower_bound - decreasing_step, 2)
+
+                # Candidates of the exhaustive search are kept since they all were evaluated
+                if self.config_search != 'exhaustive':
+                    records.clear()
+
+            # We pack the loads selected in the first trailers available of their category
+            for i in selected:
+                score, category, _, crate_type, load = pool[i]
+                t = available_trailers[category].pop(0)
+                t.packer, t.score, t.crate_type = load[3](), score, crate_type
+
+                if crate_type == 'W':
+                    t.pack(self.warehouse)
+                else:
+                    t.pack(self.metal_warehouse)
+
+                nb_of_loads_left -= 1
+
+                # We remove candidates found with the warehouse used (they might use stacks packed)
+                for key in [key for key in records if key[1] == crate_type]:
+                    records.pop(key)
+
         # We remove trailer that were not used during the loading process
         self.__remove_leftover_trailers()
 
@@ -345,94 +497,636 @@ class LoadBuilder:
 
         return packers_list[0][0], packers_list[0][1], packers_list[0][2]
 
-    def __test_all_config(self, packers, crate_type, warehouse, trailer, lower_bound, sort_choice=0):
+    def __search_loads(self, loads, crate_type, warehouse, trailer, lower_bound, sort_choice=0, deadline=None):
 
         """
-        Tests efficiently different load configurations possible for the trailer and selected warehouse
+        Tests efficiently different load configurations possible for the trailer and selected warehouse.
+        The sort options are tried one after the other until one of them gives a qualified load.
 
-        :param packers: list of tuples with crate types and packers object
+        :param loads: list that receives the list of candidate loads found with each sort option tried
+                      (see __evaluate_configs)
         :param crate_type: One type among 'W' and 'M'
         :param warehouse: object of class Warehouse from which we'll pull the stacks
         :param trailer: object of class Trailer
         :param lower_bound: actual lower bound of coverage that must be satisfied
         :param sort_choice: index indicating the sort option to take from sort_options list
+        :param deadline: moment (in seconds since epoch) at which the local search of every sort option must stop
+                         (set with the first sort option)
         """
+        if self.sort_portfolio:
+            self.__race_sort_options(loads, crate_type, warehouse, trailer, lower_bound)
 
-        if sort_choice < len(self.sort_options):
+        elif sort_choice < len(self.sort_options) and not self.__deadline_reached():
 
             # We save sort option chosen
             sort_function = self.sort_options[sort_choice][0]
             ranking_effectiveness = self.sort_options[sort_choice][1]
             decreasing_sort = self.sort_options[sort_choice][2]
 
-            # We save actual packers list length
-            nb_configs_already_found = len(packers)
+            # We save the moment at which the local search must stop (the deadline of the build if it comes first)
+            if deadline is None:
+                deadline = self.__local_search_deadline(self.deadline)
 
             # We save the number of actual stacks available in the warehouse
             nb_stacks = len(warehouse)
 
-            # We compute all possible configurations of loading (efficiently)
+            # We compute the rotation options of every stack (efficiently)
             if nb_stacks != 0 and \
-                    sum([stack.length for stack in warehouse.stacks_to_ship]) >= self.plc_lb*trailer.length:
+                    sum([stack.length for stack in warehouse]) >= self.plc_lb*trailer.length:
 
                 sort_function(warehouse, ranking_effectiveness, decreasing_sort)
-                all_configs = self.__create_all_configs(warehouse, trailer)
+                options = self.__narrow_options(warehouse, self.__rotation_options(warehouse, trailer))
             else:
-                all_configs = []
+                options = None
 
             # If there's possible configurations
-            if len(all_configs) != 0:
+            if options is not None:
 
-                for config in all_configs:
+                if self.config_search == 'branch_and_bound':
 
-                    # We initialize a packer with default parameter (except rotation)
-                    packer = newPacker(rotation=False)
+                    # We search the best configuration by placing stacks one decision at a time
+                    loads.append(self.__branch_and_bound(crate_type, warehouse, trailer, lower_bound, options))
 
-                    # We add stacks to load in the trailer (the rectangles)
-                    for i in range(len(config)):
+                elif self.config_search == 'local_search':
 
-                        # If the rectangle is rotated
-                        if config[i]:
-                            packer.add_rect(warehouse[i].length, warehouse[i].width, rid=id(warehouse[i]),
-                                            overhang=warehouse[i].overhang)
+                    # We search good orders and rotations of the stacks by moving from one to another
+                    loads.append(self.__local_search(warehouse, trailer, lower_bound, options, deadline))
 
-                        else:
-                            packer.add_rect(warehouse[i].width, warehouse[i].length, rid=id(warehouse[i]),
-                                            overhang=warehouse[i].overhang)
+                else:  # elif config_search == 'exhaustive'
+
+                    # We evaluate all configurations
+                    loads.append(self.__evaluate_configs(warehouse, trailer, lower_bound, options))
+
+                # If nothing qualified was found we retry the same steps with a new sort function
+                if self.__qualified_load(loads[-1:], crate_type, warehouse, trailer, lower_bound) is None:
+                    self.__search_loads(loads, crate_type, warehouse, trailer, lower_bound, sort_choice=sort_choice+1,
+                                        deadline=deadline)
+
+    def __race_sort_options(self, loads, crate_type, warehouse, trailer, lower_bound):
+
+        """
+        Tests the load configurations of all sort options (concurrently if there's many workers) and records their
+        candidate loads in a single list, such that the best load among all sort options is selected.
+        Sort options that are not evaluated before the end of the time budget only give the loads found so far.
+
+        :param loads: list that receives the list of candidate loads found (see __evaluate_configs)
+        :param crate_type: One type among 'W' and 'M'
+        :param warehouse: object of class Warehouse from which we'll pull the stacks
+        :param trailer: object of class Trailer
+        :param lower_bound: actual lower bound of coverage that must be satisfied
+        """
+        if len(warehouse) == 0 or \
+                sum([stack.length for stack in warehouse]) < self.plc_lb*trailer.length:
+            return
+
+        # We save the moment at which the sort options must stop (the deadline of the build if it comes first)
+        deadline = self.deadline
+        if self.portfolio_time_budget is not None:
+            deadline = min(time() + self.portfolio_time_budget, deadline or np.inf)
+
+        # We save the moment at which the local search of the sort options must stop
+        local_deadline = self.__local_search_deadline(deadline)
+
+        # We submit the evaluation of the configurations of every sort option (the stacks are sorted one option
+        # at a time, but the packing of the options is done at the same time by the workers)
+        evaluations, candidates = [], []
+        for sort_choice, (sort_function, ranking_effectiveness, decreasing_sort) in enumerate(self.sort_options):
+
+            if self.__deadline_reached() or (deadline is not None and time() >= deadline):
+                break
+
+            # We narrow the rotation options if the time left must be shared with many sort options
+            sort_function(warehouse, ranking_effectiveness, decreasing_sort)
+            options = self.__narrow_options(warehouse, self.__rotation_options(warehouse, trailer),
+                                            len(self.sort_options) - sort_choice)
+
+            if options is None:
+                continue
+
+            if self.config_search == 'branch_and_bound':
+                evaluations.append(self.__branch_and_bound(crate_type, warehouse, trailer, lower_bound, options))
+
+            elif self.config_search == 'local_search':
+                evaluations.append(self.__local_search(warehouse, trailer, lower_bound, options, local_deadline))
+
+            else:  # elif config_search == 'exhaustive'
+                evaluations.append(self.__submit_configs(warehouse, trailer, lower_bound, options, deadline))
+
+        # We gather candidate loads of all sort options (in the order of the sort options)
+        for evaluation in evaluations:
+            if self.config_search != 'exhaustive':
+                candidates += evaluation
+            else:
+                candidates += self.__collect_configs(evaluation)
+
+        # We sort candidates by decreasing score (the sort is stable so ties keep the order of the sort options)
+        candidates.sort(key=lambda c: c[0], reverse=True)
+        loads.append(candidates)
+
+    def __qualified_load(self, loads, crate_type, warehouse, trailer, lower_bound):
+
+        """
+        Selects the best candidate load that satisfies the lower bound of coverage (and the sanity check with the
+        reference trailer if needed) with the first sort option that has one
+
+        :param loads: list of lists of candidate loads found with each sort option tried
+        :param crate_type: One type among 'W' and 'M'
+        :param warehouse: object of class Warehouse from which we'll pull the stacks
+        :param trailer: object of class Trailer
+        :param lower_bound: actual lower bound of coverage that must be satisfied
+        :return: candidate load (None if no candidate is qualified)
+        """
+        return next(self.__qualified_candidates(loads, crate_type, warehouse, trailer, lower_bound), None)
+
+    def __qualified_candidates(self, loads, crate_type, warehouse, trailer, lower_bound):
+
+        """
+        Generates the candidate loads that satisfy the lower bound of coverage (and the sanity check with the
+        reference trailer if needed), in the order of the sort options and of the scores (see __qualified_load)
+
+        :param loads: list of lists of candidate loads found with each sort option tried
+        :param crate_type: One type among 'W' and 'M'
+        :param warehouse: object of class Warehouse from which we'll pull the stacks
+        :param trailer: object of class Trailer
+        :param lower_bound: actual lower bound of coverage that must be satisfied
+        :return: generator of candidate loads
+        """
+        for candidates in loads:
+            for load in candidates:
+                if load[1] >= lower_bound * trailer.length:
+
+                    # We look if the load is also qualified with the reference trailer (only once for each load)
+                    if load[4] is None:
+                        load[4] = trailer.category != 'DRYBOX' or not self.validate_with_ref or \
+                                  self.__sanity_check(crate_type, warehouse, load[2])
+
+                    if load[4]:
+                        yield load
+
+    def __evaluate_configs(self, warehouse, trailer, lower_bound, options):
+
+        """
+        Evaluates configurations of loading (using the packing cache and the pool of workers if activated).
+        Each candidate load is a list with its score, the length covered, the ids of the stacks used, a function
+        building its packer and a boolean indicating if it is valid with the reference trailer (None until checked).
+
+        :param warehouse: object of class Warehouse from which we'll pull the stacks
+        :param trailer: object of class Trailer
+        :param lower_bound: actual lower bound of coverage that must be satisfied
+        :param options: List of tuples of boolean indicating rotation values allowed for each stack
+        :return: list of candidate loads sorted by decreasing score (ties are broken in favor of the configuration
+                 with the smallest bitmask, see config_of_mask, unless the packing stopped early, in which case the
+                 configurations that were not packed are missing)
+        """
+        candidates = self.__collect_configs(self.__submit_configs(warehouse, trailer, lower_bound, options,
+                                                                  self.deadline))
+
+        # We sort candidates by decreasing score (the sort is stable so ties keep the order of the configurations)
+        candidates.sort(key=lambda c: c[0], reverse=True)
+
+        return candidates
+
+    def __submit_configs(self, warehouse, trailer, lower_bound, options, deadline=None):
+
+        """
+        Starts the evaluation of configurations of loading. The configurations are generated lazily in the order of
+        the depth-first walk of their rotation decisions (see class_masks). Results already saved in the packing
+        cache are reused and the others are packed as soon as they are generated, or by subtrees of the walk with
+        the pool of workers if activated (without waiting for them).
+        If bound_termination is True, the packing stops as soon as a configuration gives a qualified load reaching
+        the upper bound of the score (see __score_target). Configurations are walked in the order of the trie, not
+        in the order of their bitmasks, so a configuration with a smaller bitmask reaching the same score might never
+        be packed and the load kept can differ from the one of a complete packing (hence it is off by default).
+
+        :param warehouse: object of class Warehouse from which we'll pull the stacks
+        :param trailer: object of class Trailer
+        :param lower_bound: actual lower bound of coverage that must be satisfied
+        :param options: List of tuples of boolean indicating rotation values allowed for each stack
+        :param deadline: moment (in seconds since epoch) after which configurations are not packed anymore
+        :return: tuple with all information needed by __collect_configs
+        """
+
+        # We save the footprints of the stacks and the dimensions of the trailer (only these are needed to pack)
+        footprints = tuple(stacks_dimensions(warehouse))
+        trailer_dims = (trailer.width, trailer.length, trailer.oh)
+
+        # We save the ids and the number of mandatory crates of the stacks (the warehouse might be sorted again
+        # before the results are collected)
+        ids = [id(stack) for stack in warehouse]
+        mandatory = [stack.nb_of_mandatory for stack in warehouse]
+
+        # We save the moment at which the packing starts
+        start = time()
+
+        # We save what is needed to look for results in the packing cache and to build the candidate loads
+        # (configurations are encoded by bitmasks of k bits, where k is the number of stacks with two rotation
+        # values allowed)
+        options = tuple(options)
+        search = (footprints, trailer_dims, ids, mandatory, options,
+                  (trailer_dims, self.individual_width_tolerance, footprints, options))
+        classes = self.__rotation_classes(options, footprints)
+
+        # We compute the score that makes a load unbeatable (the configurations after a result saved reaching it
+        # are not packed)
+        target = self.__score_target(footprints, mandatory, trailer, lower_bound, options)
+
+        # We initialize the list of tuples with the bitmask and the candidate load of the configurations that
+        # cover a length and an indicator that a result saved reached the target
+        candidates, target_reached = [], [False]
+
+        # We pack the configurations missing (by subtrees of the walk with the pool of workers if the user wants to).
+        # Each subtree is sent with the configurations found in the cache, which must not be packed again.
+        if self.nb_of_workers > 1 and nb_of_configs(classes) > 1:
+            tasks = []
+            for prefix in class_prefixes(classes, self.nb_of_workers * self.chunks_per_worker):
+                saved = set()
+                nb_missing = sum(1 for _ in self.__uncached_masks(search, class_masks(classes, prefix), target,
+                                                                  candidates, target_reached, saved))
+                if target_reached[0]:
+                    break
+
+                if nb_missing > 0:
+                    tasks.append((footprints, trailer_dims, options, classes, prefix, frozenset(saved),
+                                  self.individual_width_tolerance, deadline, target, self.pack_algo))
+
+            new_results = get_workers_pool(self.nb_of_workers).starmap_async(evaluate_prefix, tasks)
+
+        else:
+            masks = self.__uncached_masks(search, class_masks(classes), target, candidates, target_reached)
+            new_results = [evaluate_configs(footprints, trailer_dims, options, masks, self.individual_width_tolerance,
+                                            deadline, target, self.pack_algo)]
+
+        return search, candidates, new_results, start
+
+    def __uncached_masks(self, search, masks, target, candidates, target_reached, saved=None):
+
+        """
+        Generates the bitmasks of the configurations whose results are not in the packing cache. The candidate loads
+        of the results found are added to the candidates and the generation stops if one of them reaches the target.
+
+        :param search: tuple with the information on the search saved by __submit_configs
+        :param masks: iterable of bitmasks of configurations
+        :param target: tuple returned by __score_target (None = no target)
+        :param candidates: list receiving tuples with the bitmask and the candidate load of the results found
+        :param target_reached: list with a boolean set to True if a result found reaches the target
+        :param saved: set receiving the bitmasks of the results found (None = not needed)
+        :return: generator of bitmasks
+        """
+        search_key = search[5]
+
+        for mask in masks:
+            result = self.packing_cache.get((search_key, mask))
+
+            if result is None:
+                yield mask
+
+            else:
+                if saved is not None:
+                    saved.add(mask)
+
+                candidate = self.__candidate(search, mask, result)
+                if candidate is not None:
+                    candidates.append((mask, candidate))
+
+                if target is not None and reaches_target(result, target):
+                    target_reached[0] = True
+                    return
+
+    def __candidate(self, search, mask, result):
+
+        """
+        Builds the candidate load of a configuration packed (see __evaluate_configs), the packer being built only
+        if needed
+
+        :param search: tuple with the information on the search saved by __submit_configs
+        :param mask: bitmask of the configuration
+        :param result: tuple with positions of the stacks in the trailer, area used and length covered
+        :return: candidate load (None if the configuration doesn't cover a length)
+        """
+        footprints, trailer_dims, ids, mandatory, options, _ = search
+        positions, used_area, covered_length = result
+
+        if covered_length is None:
+            return None
+
+        score = used_area * self.score_multiplication_base**sum(mandatory[i] for i in positions)
+
+        return [score, covered_length, [ids[i] for i in positions],
+                partial(pack_config, footprints, ids, trailer_dims, config_of_mask(options, mask), self.pack_algo),
+                None]
+
+    def __collect_configs(self, evaluation):
+
+        """
+        Waits for the results of an evaluation started with __submit_configs and builds the candidate loads
+        (see __evaluate_configs) of the configurations that cover a length
+
+        :param evaluation: tuple returned by __submit_configs
+        :return: list of candidate loads (in the order of the bitmasks of the configurations)
+        """
+        search, candidates, new_results, start = evaluation
+        search_key = search[5]
+
+        # We save the results of the configurations packed (the ones after the deadline were skipped)
+        if not isinstance(new_results, list):
+            new_results = new_results.get()
+
+        nb_of_results = 0
+        for results, deadline_reached in new_results:
+            for mask, result in results:
+                self.packing_cache.add((search_key, mask), result)
+                candidate = self.__candidate(search, mask, result)
+                if candidate is not None:
+                    candidates.append((mask, candidate))
+
+            nb_of_results += len(results)
+
+            # We mark the build as incomplete if configurations were skipped because of its deadline
+            # (the ones skipped because a load reached the upper bound of the score don't count)
+            if deadline_reached:
+                self.__deadline_reached()
+
+        # We update the time spent to pack configurations
+        self.packing_time[0] += time() - start
+        self.packing_time[1] += nb_of_results
+
+        # We order the candidates by bitmask (ties of scores are broken in favor of the smallest one)
+        candidates.sort(key=lambda c: c[0])
+
+        return [candidate for _, candidate in candidates]
+
+    def __branch_and_bound(self, crate_type, warehouse, trailer, lower_bound, options):
+
+        """
+        Searches the best configuration of loading by placing stacks one rotation decision at a time.
+        Subtrees of decisions whose optimistic score cannot beat the best qualified packer found so far are pruned.
+        Ties are broken as in the exhaustive search (the configuration with the smallest bitmask wins), unless the
+        search stops because a packer reached the upper bound of the score (see bound_termination).
+
+        :param crate_type: One type among 'W' and 'M'
+        :param warehouse: object of class Warehouse from which we'll pull the stacks
+        :param trailer: object of class Trailer
+        :param lower_bound: actual lower bound of coverage that must be satisfied
+        :param options: List of tuples of boolean indicating rotation values allowed for each stack
+        :return: list with the best qualified load found as a candidate load (see __evaluate_configs)
+        """
+
+        # We compute the area and the smallest side of the stacks that could still enter the trailer from every
+        # position of the warehouse and sort the ones with mandatory crates by their area per mandatory crate
+        remaining_area, smallest_side = [0]*(len(warehouse)+1), [trailer.width]*(len(warehouse)+1)
+        mandatory_stacks = [[]]*(len(warehouse)+1)
+        for i in range(len(warehouse)-1, -1, -1):
+            remaining_area[i], smallest_side[i] = remaining_area[i+1], smallest_side[i+1]
+            mandatory_stacks[i] = mandatory_stacks[i+1]
+            if trailer.fit(warehouse[i]) or (warehouse[i].rotation and trailer.fit(warehouse[i], rotated=True)):
+                remaining_area[i] += warehouse[i].area()
+                smallest_side[i] = min(smallest_side[i], warehouse[i].width, warehouse[i].length)
+                if warehouse[i].nb_of_mandatory > 0:
+                    mandatory_stacks[i] = sorted(mandatory_stacks[i] + [(warehouse[i].area(),
+                                                                         warehouse[i].nb_of_mandatory)],
+                                                 key=lambda s: s[0]/s[1])
+
+        # We save the largest area that can be covered in the trailer (overhang included)
+        max_area = trailer.width * (trailer.length + trailer.oh)
+
+        # We save the score that makes a packer unbeatable (packers are validated with the reference trailer here)
+        if self.bound_termination:
+            score_bound = score_upperbound(stacks_dimensions(warehouse),
+                                           [stack.nb_of_mandatory for stack in warehouse],
+                                           (trailer.width, trailer.length, trailer.oh),
+                                           self.score_multiplication_base, options)
+        else:
+            score_bound = np.inf
+
+        # We initialize the bin of the trailer that will receive the rectangles as soon as they are added (stacks that
+        # don't enter it never influence its packing). Its state is saved before each decision and restored for
+        # the next one, as in packed_configs.
+        bin = self.pack_algo(trailer.width, trailer.length, rot=False, overhang=trailer.oh)
+        footprints, ids = stacks_dimensions(warehouse), [id(stack) for stack in warehouse]
+
+        # We initialize the best load found (score, position in the exhaustive list of configurations, length covered,
+        # ids of the stacks used and configuration) and the number of configurations completed
+        best = [0, None, None, None, None]
+        nb_of_leaves = [0]
+
+        # We save the moment at which the search starts
+        start = time()
+
+        # We save the class of each mask bit (a class is closed once one of its stacks is not rotated, since only
+        # the first stacks of a class can be rotated, see class_masks)
+        class_of_bit = {}
+        for class_index, bits in enumerate(self.__rotation_classes(options, footprints)):
+            for class_bit in bits:
+                class_of_bit[class_bit] = class_index
+
+        def explore(depth, index, bit, area, mandatory, closed, config):
+
+            """
+            Explores the node of the decisions tree reached with the configuration given (whose stacks are placed in
+            the bin). The node holds the depth, the position index of the configuration and weight of the next
+            position bit, the area and the number of mandatory crates placed in the trailer and the classes closed.
+            Returns False if the search must stop.
+            """
+            if self.__deadline_reached():
+                return False
+
+            # If all rotation decisions were taken, we complete and validate the packing
+            if depth == len(options):
+
+                complete_packing(footprints, ids, trailer.width, trailer.length, bin, depth)
+                qualified, score = self.__validate_packing(trailer, crate_type, bin, lower_bound)
+                nb_of_leaves[0] += 1
+
+                if qualified and (best[1] is None or score > best[0] or (score == best[0] and index < best[1])):
+                    best[:] = score, index, bin.covered_length(self.individual_width_tolerance), \
+                        [rect.rid for rect in bin], list(config)
+
+                    # We stop if the load can't be beaten (with a small tolerance for rounding errors)
+                    if best[0] >= score_bound * (1 - 1e-9):
+                        return False
+
+                return True
+
+            # We compute an optimistic score for all loads that can be obtained from this node
+            if best[1] is not None:
+                if len(bin) > 0:
+                    free_area = bin.free_area(smallest_side[depth], smallest_side[depth], overhang=True)
+                else:
+                    free_area = max_area
+                optimistic_area = area + min(remaining_area[depth], free_area)
+                optimistic_mandatory = mandatory + mandatory_upperbound(mandatory_stacks[depth], free_area)
+                optimistic_score = optimistic_area * self.score_multiplication_base**optimistic_mandatory
+
+                # We prune the node if it cannot beat the best load (with a small tolerance for rounding errors)
+                if optimistic_score * (1 + 1e-9) < best[0] or \
+                        (optimistic_score * (1 - 1e-9) <= best[0] and index > best[1]):
+                    return True
+
+            # We explore the child nodes (the non rotated one first)
+            stack = warehouse[depth]
+            values = options[depth]
+            if len(values) > 1:
+                child_closed = closed | (1 << class_of_bit[bit])
+                if child_closed == closed:
+                    values = values[:1]
+            else:
+                child_closed = closed
+
+            state = bin.checkpoint()
+
+            for position, rotated in enumerate(values):
+
+                bin.restore(state)
+
+                if rotated:
+                    width, length = stack.length, stack.width
+                else:
+                    width, length = stack.width, stack.length
+
+                # We add the rectangle and look if it entered the trailer
+                in_trailer = bin.add_rect(width, length, ids[depth], stack.overhang, True) is not None
+
+                config.append(rotated)
+                go_on = explore(depth+1, index + position*bit, bit*len(options[depth]),
+                                area + in_trailer*width*length, mandatory + in_trailer*stack.nb_of_mandatory,
+                                child_closed if position == 0 else closed, config)
+                config.pop()
+
+                if not go_on:
+                    return False
 
-                    # We add other dummy bins to store rectangles that do not enter in our trailer (1st bin)
-                    for i in range(2):
-                        packer.add_bin(trailer.width, trailer.length, bid=None, overhang=trailer.oh)
+            return True
 
-                    # We execute the packing
-                    packer.pack()
+        explore(0, 0, 1, 0, 0, 0, [])
 
-                    # We complete the packing (look if some unconsidered rectangles could enter at the end)
-                    self.__complete_packing(warehouse, trailer, packer, len(config))
+        # We update the time spent to pack configurations
+        self.packing_time[0] += time() - start
+        self.packing_time[1] += nb_of_leaves[0]
 
-                    # We check if packing respect plc lower bound and how many items it contains
-                    qualified, score = self.__validate_packing(trailer, crate_type, packer, lower_bound)
+        # We return the best load found (its packer is built again with its configuration) if one was qualified
+        best_score, best_index, covered_length, rids, config = best
+        if best_index is None:
+            return []
+
+        return [[best_score, covered_length, rids,
+                 partial(pack_config, footprints, ids, (trailer.width, trailer.length, trailer.oh), config,
+                         self.pack_algo), True]]
 
-                    # We save the loading configuration (the packer) if the loading is qualified
-                    if qualified:
-                        packers.append((packer, crate_type, score))
+    def __local_search_deadline(self, deadline=None):
 
-                # We check if some loading configurations were found
-                new_configuration_found = len(packers) - nb_configs_already_found
+        """
+        Computes the moment at which the local search of a trailer must stop. The time budget is shared by all the
+        sort options tried for the trailer.
 
-                # If nothing was found we retry the same steps with a new sort function
-                if new_configuration_found == 0:
-                    self.__test_all_config(packers, crate_type, warehouse, trailer,
-                                           lower_bound, sort_choice=sort_choice+1)
+        :param deadline: moment (in seconds since epoch) at which the search must stop if it comes first
+        :return: moment in seconds since epoch
+        """
+        return min(time() + self.local_search_time_budget, deadline or np.inf)
 
-    def __validate_packing(self, trailer, crate_type, packer, lower_bound):
+    def __local_search(self, warehouse, trailer, lower_bound, options, deadline):
+
+        """
+        Searches good loads by simulated annealing over the order and the rotation of the stacks considered, starting
+        from the order of the warehouse and the first rotation value allowed for each stack.
+        Moves swap two stacks, rotate a stack or reinsert a stack elsewhere in the order. Loads are decoded with the
+        Skyline packer (see pack_config) and scored as in __validate_packing, except that loads which don't satisfy
+        the lower bound count for half of their score to guide the search towards qualified loads.
+        The search stops after local_search_iterations moves, at the deadline given or when a load reaches the upper
+        bound of the score (see bound_termination).
+
+        :param warehouse: object of class Warehouse from which we'll pull the stacks
+        :param trailer: object of class Trailer
+        :param lower_bound: actual lower bound of coverage that must be satisfied
+        :param options: List of tuples of boolean indicating rotation values allowed for each stack
+        :param deadline: moment (in seconds since epoch) at which the search must stop (see __local_search_deadline)
+        :return: list of the qualified loads found as candidate loads sorted by decreasing score
+                 (see __evaluate_configs)
+        """
+        # We save the footprints, the ids and the number of mandatory crates of the stacks
+        footprints = stacks_dimensions(warehouse)
+        trailer_dims = (trailer.width, trailer.length, trailer.oh)
+        ids = [id(stack) for stack in warehouse]
+        mandatory = [stack.nb_of_mandatory for stack in warehouse]
+        rotatable = [i for i in range(len(options)) if len(options[i]) > 1]
+        target = self.__score_target(footprints, mandatory, trailer, lower_bound, options)
+
+        # We initialize a random generator (with a seed to get the same loads from one build to another)
+        rng = Random(0)
+
+        # We initialize a dictionary with the score and the candidate load of every solution evaluated
+        evaluated = {}
+
+        def evaluate(order, config):
+            key = (tuple(order), tuple(config))
+            if key not in evaluated:
+                stacks_order = order + list(range(len(order), len(footprints)))
+                stacks_footprints = [footprints[i] for i in stacks_order]
+                stacks_ids = [ids[i] for i in stacks_order]
+                bin = self.pack_algo(trailer.width, trailer.length, rot=False, overhang=trailer.oh)
+                _, (positions, used_area, covered_length) = next(packed_configs(
+                    bin, stacks_footprints, trailer_dims, [(value,) for value in config], [0],
+                    self.individual_width_tolerance))
+                score = used_area * self.score_multiplication_base**sum(mandatory[stacks_order[i]] for i in positions)
+
+                if covered_length is not None and covered_length >= lower_bound * trailer.length:
+                    evaluated[key] = (score, [score, covered_length, [stacks_ids[i] for i in positions],
+                                              partial(pack_config, stacks_footprints, stacks_ids, trailer_dims,
+                                                      list(config), self.pack_algo), None])
+                else:
+                    evaluated[key] = (score / 2, None)
+
+            return evaluated[key][0]
+
+        # We initialize the actual solution and its score
+        order, config = list(range(len(options))), [option[0] for option in options]
+        value = evaluate(order, config)
+        best_value = value
+
+        for iteration in range(self.local_search_iterations):
+
+            # We stop at the deadline or if a load can't be beaten
+            if time() >= deadline or (target is not None and best_value >= target[2] * (1 - 1e-9)):
+                break
+
+            # We build a neighbor solution with a random move
+            new_order, new_config = list(order), list(config)
+            move = rng.randrange(3)
+
+            if move == 1 and len(rotatable) > 0:
+                i = new_order.index(rng.choice(rotatable))
+                new_config[i] = not new_config[i]
+
+            elif len(order) > 1:
+                i, j = rng.sample(range(len(order)), 2)
+                if move == 0:
+                    new_order[i], new_order[j] = new_order[j], new_order[i]
+                    new_config[i], new_config[j] = new_config[j], new_config[i]
+                else:
+                    new_order.insert(j, new_order.pop(i))
+                    new_config.insert(j, new_config.pop(i))
+
+            # We accept the neighbor if it's better or with a probability that decreases with the temperature
+            new_value = evaluate(new_order, new_config)
+            temperature = 0.02 * best_value * (1 - iteration / self.local_search_iterations)
+
+            if new_value >= value or (temperature > 0 and rng.random() < exp((new_value - value) / temperature)):
+                order, config, value = new_order, new_config, new_value
+                best_value = max(best_value, value)
+
+        # We return the qualified loads found (in the order in which they were found for ties)
+        candidates = [candidate for _, candidate in evaluated.values() if candidate is not None]
+        candidates.sort(key=lambda c: c[0], reverse=True)
+
+        return candidates
+
+    def __validate_packing(self, trailer, crate_type, bin, lower_bound):
 
         """
         Verifies if the packing satisfies plc_lb constraint (Lower bound of percentage of length that must be covered)
 
         :param trailer: trailer for which we're testing configurations possible
         :param crate_type: 'W' for wood, 'M' for metal
-        :param packer: Packer object
+        :param bin: bin of the trailer (first bin of the packer)
         :param lower_bound: actual lower bound of coverage that must be satisfied
         :returns: Boolean indicating if the loading satisfies constraint and a score for the load
         """
@@ -441,7 +1135,6 @@ class LoadBuilder:
         mandatory_crates = 0
         score = 0
         qualified = True
-        bin = packer[0]
         if crate_type == 'W':
             warehouse = self.warehouse
         else:
@@ -455,7 +1148,7 @@ class LoadBuilder:
             qualified = False
         else:
             used_area = bin.used_area()
-            ids_used = [rect.rid for rect in bin]
+            ids_used = set(rect.rid for rect in bin)
             mandatory_crates += sum([stack.nb_of_mandatory for stack in warehouse if id(stack) in ids_used])
             score_boost = self.score_multiplication_base**mandatory_crates
             score = used_area*score_boost
@@ -520,66 +1213,140 @@ class LoadBuilder:
         else:
             return self.__max_rect_upperbound(warehouse, trailer, new_upper_bound)
 
-    def __create_all_configs(self, warehouse, trailer):
+    def __score_target(self, footprints, mandatory, trailer, lower_bound, options):
+
+        """
+        Computes the target that makes a load unbeatable for a search of configurations (see bounds.py)
+
+        :param footprints: list of tuples returned by stacks_dimensions
+        :param mandatory: list with the number of mandatory crates of each stack
+        :param trailer: object of class Trailer
+        :param lower_bound: actual lower bound of coverage that must be satisfied
+        :param options: List of tuples of boolean indicating rotation values allowed for each stack
+        :return: tuple with the number of mandatory crates of each stack, the score multiplication base, the upper
+                 bound of the score and the length that must be covered (None if the search can't stop early)
+        """
+        # We can't stop early if loads need to be validated with the reference trailer since the best one could fail
+        if not self.bound_termination or (trailer.category == 'DRYBOX' and self.validate_with_ref):
+            return None
+
+        trailer_dims = (trailer.width, trailer.length, trailer.oh)
+        score_bound = score_upperbound(footprints, mandatory, trailer_dims, self.score_multiplication_base, options)
+
+        return tuple(mandatory), self.score_multiplication_base, score_bound, lower_bound * trailer.length
+
+    def __deadline_reached(self):
+
+        """
+        Verifies if the deadline of the build is reached and marks the build as incomplete if it's the case
+
+        :return: boolean
+        """
+        if self.deadline is not None and time() >= self.deadline:
+            self.build_complete = False
+            return True
+
+        return False
+
+    def __narrow_options(self, warehouse, options, nb_of_searches=1):
 
         """
-        Creates all configurations of loading (using warehouse units) that can be done for the trailer.
+        Narrows the rotation options if the configurations cannot be evaluated in the time left before the deadline.
+        The last stacks with many rotation values allowed keep only their first one until the number of
+        configurations can be packed in half of the time left divided by the number of searches that share it
+        (considering the average time needed to pack a configuration so far).
+
+        :param warehouse: Object of class warehouse
+        :param options: List of tuples of boolean indicating rotation values allowed for each stack (or None)
+        :param nb_of_searches: number of searches that will share the time left
+        :return: List of tuples of boolean indicating rotation values allowed for each stack (or None)
+        """
+        if options is None or self.deadline is None or self.packing_time[1] == 0:
+            return options
+
+        # We compute the number of configurations that can be packed in the time allowed
+        time_per_config = self.packing_time[0] / self.packing_time[1]
+        max_nb_of_configs = max(int((self.deadline - time()) / (2 * nb_of_searches * time_per_config)), 1)
+
+        footprints = stacks_dimensions(warehouse)
+        i = len(options) - 1
+
+        while nb_of_configs(self.__rotation_classes(options, footprints)) > max_nb_of_configs and i >= 0:
+
+            if len(options[i]) > 1:
+                options[i] = options[i][:1]
+                self.build_complete = False
+
+            i -= 1
+
+        return options
+
+    def __rotation_classes(self, options, footprints):
+
+        """
+        Groups the stacks with two rotation values allowed in classes. If symmetry breaking is activated, stacks with
+        the same footprint are in the same class, otherwise each stack is alone in its class.
+
+        :param options: List of tuples of boolean indicating rotation values allowed for each stack
+        :param footprints: list of tuples returned by stacks_dimensions
+        :return: list with the mask bits of the stacks of each class (in the order of the stacks)
+        """
+        classes, bit = {}, 1
+
+        for i, option in enumerate(options):
+            if len(option) > 1:
+                key = footprints[i] if self.symmetry_breaking else i
+                classes.setdefault(key, []).append(bit)
+                bit <<= 1
+
+        return list(classes.values())
+
+    def __rotation_options(self, warehouse, trailer):
+
+        """
+        Lists the rotation values that can be considered for every stack of the loading.
         To avoid considering a large number of bad configurations and enhance the efficiency of the algorithm,
         we will pre-set wisely the positions of rectangles for a certain range of the trailer and THEN consider
-        all possible configurations for the end of the loading of the trailer.
+        all possible rotations for the end of the loading of the trailer.
 
         :param warehouse: Object of class warehouse
         :param trailer: Object of class Trailer
-        :return: List of list of boolean indicating permission of rotation
+        :return: List of tuples of boolean indicating rotation values allowed for each stack (None if no stack fits)
         """
 
-        # We initialize a numpy array of configurations (only one configuration for now)
+        # We initialize the list of options with the pre-rotated stacks (only one option for each of them)
         configs, nb_oversize = warehouse.merge_for_trailer(trailer, self.individual_width_tolerance)
-        configs = np.array([configs])
+        options = [(rotated,) for rotated in configs]
 
         # We compute an upper bound for the maximal number of rectangles that can fit in our trailer
         nb_rect_to_consider = len(warehouse) - nb_oversize
 
         if nb_rect_to_consider == 0:
-            return []
+            return None
 
         ub = self.__max_rect_upperbound(warehouse, trailer, nb_rect_to_consider)
 
-        # We save the number of stack pre-rotated
-        nb_of_pre_rotated = configs.shape[1]
-
         # Initialization of list that will contain index of stack that cannot fit in the trailer
         leftover = []
 
         # We set the start index and the end index of research to build possible configurations
-        i = nb_of_pre_rotated
+        i = len(options)
         end_index = min(len(warehouse), ub)
 
         while i < end_index:
 
-            # We pretend that the item doesn't fit in the trailer
-            fit = False
-
-            # We initialize an empty numpy array of new configurations
-            new_configs = np.array([[]])
-
-            # If it's possible to rotate the i-th item in the warehouse for this trailer
-            if warehouse[i].rotation and trailer.fit(warehouse[i], rotated=True):
-
-                # We add the rotated rectangle indicator (True) to all configs found until now
-                true_vec = [[True]] * len(configs)
-                new_configs = np.append(np.copy(configs), true_vec, axis=1)
-                fit = True
+            # We initialize the tuple of rotation values allowed for the i-th item
+            option = ()
 
             # If the i-th item fit not rotated in this trailer
             if trailer.fit(warehouse[i]):
+                option += (False,)
 
-                # We add the rotated rectangle indicator (False) to all configs found until now
-                false_vec = [[False]] * len(configs)
-                configs = np.append(configs, false_vec, axis=1)
-                fit = True
+            # If it's possible to rotate the i-th item in the warehouse for this trailer
+            if warehouse[i].rotation and trailer.fit(warehouse[i], rotated=True):
+                option += (True,)
 
-            if not fit:
+            if len(option) == 0:
 
                 # We add the stack index in the leftover list
                 leftover.append(i)
@@ -588,61 +1355,85 @@ class LoadBuilder:
                 end_index = min(len(warehouse), end_index + 1)
 
             else:
-                # We update configurations
-                if new_configs.shape[1] == configs.shape[1]:
-                    configs = np.append(configs, new_configs, axis=0)
-
-                elif new_configs.shape[1] > configs.shape[1]:
-                    configs = new_configs
+                options.append(option)
 
             i += 1
 
         # We push leftover at the end of the warehouse to avoid conflict during loading process
         if len(leftover) > 0:
-            for j in leftover:
-                warehouse.add_stack(warehouse[j])
-            warehouse.remove_stacks(leftover)
+            warehouse.move_stacks_to_end(leftover)
 
-        return configs
+        return options
 
     def __sanity_check(self, crate_type, warehouse, warehouse_used_ids):
 
-        # Initialization of the reference trailer
-        t = dc(LoadBuilder.trailer_reference)
+        """
+        Verifies if the stacks used by a load could also make a qualified load in the reference trailer.
+        Obvious failures are found by __sanity_prefilter, the others with a search done on a view of the warehouse
+        with the stacks used (nothing is copied). The result is saved for the rest of the build, so each set of
+        stacks is checked only once.
+
+        :param crate_type: One type among 'W' and 'M'
+        :param warehouse: object of class Warehouse from which the stacks were pulled
+        :param warehouse_used_ids: list of ids of the stacks used by the load
+        :return: boolean
+        """
+        # We look if the same stacks were already checked
+        signature = (crate_type, frozenset(warehouse_used_ids))
+        if signature in self.sanity_checks:
+            return self.sanity_checks[signature]
 
-        # We save the actual length of the trailer
-        original_length = t.length
+        # Initialization of the reference trailer, with a length changed to avoid wrong sanity check results
+        # because of overflow problem
+        ref = LoadBuilder.trailer_reference
+        t = LoadObj.Trailer(cat=ref.category, l=self.max_trailer_length, w=ref.width, h=ref.height,
+                            p=ref.priority, oh=ref.oh)
 
-        # We change the length of the trailer to avoid wrong sanity check results because of overflow problem
-        t.length = self.max_trailer_length
+        # We build a view of the warehouse with the stacks used only
+        w = warehouse.view(signature[1])
 
-        # Initialization of an empty list that will contain tuples of crate_type and packer
-        packers = []
+        # We compute the plc_lb to satisfy based on original_length and select the best packer with our function
+        lowerbound = round((self.plc_lb*ref.length)/t.length, 4)
 
-        # We get all index used in the actual warehouse
-        warehouse_used_indexes = []
-        for index, stack in enumerate(warehouse.stacks_to_ship):
-            if id(stack) in warehouse_used_ids:
-                warehouse_used_indexes.append(index)
+        # We look if the load obviously fails
+        self.sanity_checks[signature] = self.__sanity_prefilter(w, t, lowerbound)
 
-        # Construction of a copy of the warehouse
-        w = dc(warehouse)
+        if self.sanity_checks[signature] is None:
 
-        # We build a list with all indexes unused
-        all_indexes = set(list(range(len(warehouse))))
-        unused_indexes = list(all_indexes-set(warehouse_used_indexes))
+            # We test all configurations possible
+            loads = []
+            self.__search_loads(loads, crate_type, w, t, lowerbound)
 
-        # We remove unused index from the warehouse copy
-        w.remove_stacks(unused_indexes)
+            # False would indicate that no satisfying load could be done with the reference trailer
+            self.sanity_checks[signature] = self.__qualified_load(loads, crate_type, w, t, lowerbound) is not None
 
-        # We compute the plc_lb to satisfy based on original_length and select the best packer with our function
-        lowerbound = round((self.plc_lb*original_length)/t.length, 4)
+        return self.sanity_checks[signature]
 
-        # We test all configurations possible
-        self.__test_all_config(packers, crate_type, w, t, lowerbound)
+    def __sanity_prefilter(self, warehouse, ref_trailer, lower_bound):
 
-        # False would indicate that no satisfying load could be done with the reference trailer
-        return len(packers) != 0
+        """
+        Rejects the loads that obviously fail the sanity check, without packing. The stacks of these loads are too
+        short to satisfy the reference lower bound, even when they are placed one after the other in their longest
+        orientation that fits in the reference trailer (or too short to be considered by __search_loads).
+        These are only necessary conditions, a load that passes them must still be checked by the full search
+        (the search sorts, merges and rotates the stacks for the reference trailer, hence a placement found in
+        another trailer proves nothing).
+
+        :param warehouse: view of the warehouse with the stacks used by the load
+        :param ref_trailer: reference trailer (with the maximal length)
+        :param lower_bound: lower bound of coverage that must be satisfied in the reference trailer
+        :return: False or None if the result is not obvious
+        """
+        length_needed = lower_bound * ref_trailer.length
+
+        if sum(stack.length for stack in warehouse) < self.plc_lb * ref_trailer.length:
+            return False
+
+        stacks = orientations(stacks_dimensions(warehouse), (ref_trailer.width, ref_trailer.length, ref_trailer.oh))
+        if sum(max(l for _, l in fitting) for _, _, fitting in stacks) < length_needed:
+            return False
+
+        return None
 
     @staticmethod
     def __complete_packing(warehouse, trailer, packer, start_index):
@@ -656,40 +1447,8 @@ class LoadBuilder:
         :param start_index: If i is the index of the last item we considered in first part, then start_index = i + 1
         :returns : number of stacks added
         """
-
-        # We look if there are items remaining in the warehouse (that were not considered in the first phase of packing)
-        # and if there's still place in the trailer.
-        if len(warehouse) != start_index and max([rect.top for rect in packer[0]]) < trailer.length:
-
-            # We save the current number of stack in the trailer
-            last_res = len(packer[0])
-
-            # We initialize a new packer with rotation not allowed to simply computation and save time
-            new_packer = newPacker(rotation=False)
-
-            # We add rectangles unconsidered in the first phase of packing
-            for i in range(start_index, len(warehouse)):
-                new_packer.add_rect(warehouse[i].width, warehouse[i].length, rid=id(warehouse[i]),
-                                    overhang=warehouse[i].overhang, rect_rotation=warehouse[i].rotation)
-
-            # We add a large number of dummy bins
-            for j in range(len(warehouse) - start_index + 1):
-                new_packer.add_bin(trailer.width, trailer.length, overhang=packer[0].overhang_measure)
-
-            # We open the first bin
-            new_packer._open_bins.append(packer[0])
-
-            # We allow unlock rotation in this first bin.
-            new_packer[0].rot = True
-
-            # We pack the new packer
-            new_packer.pack(reset_opened_bins=False)
-
-            # We return the number of stacks added
-            return len(new_packer[0]) - last_res
-
-        else:
-            return 0
+        return complete_packing(stacks_dimensions(warehouse), [id(stack) for stack in warehouse],
+                                trailer.width, trailer.length, packer[0], start_index)
 
     def __remove_leftover_trailers(self):
 
@@ -785,7 +1544,7 @@ class LoadBuilder:
         for trailer in self.trailers_done:
 
             # We save the quantities of every models inside the trailer
-            s = Counter(trailer.load_summary())
+            s = trailer.load_summary()
 
             # Every line of data frame has the category of trailer, his length, his remaining_length (in feets)
             # and the quantities of every models in it.
@@ -847,7 +1606,7 @@ class LoadBuilder:
 
                     trailer.pack(warehouse, nb_stacks_added)
 
-    def build(self, models_data, max_load, plot_load_done=False, ranking={}):
+    def build(self, models_data, max_load, plot_load_done=False, ranking={}, time_budget=None):
 
         """
         This is the core of the object.
@@ -857,12 +1616,22 @@ class LoadBuilder:
         :param max_load: maximum number of loads
         :param plot_load_done: boolean that indicates if plots of loads are going to be shown
         :param ranking: dictionnary with ranking lists associated with each size code
+        :param time_budget: seconds allowed to the build (build_time_budget is used if None). Searches are narrowed
+                            as time runs out and the loads found are kept once it's over (see build_complete).
         :return: list of tuples with size code used and crate types
         """
+        self.build_complete = True
+
         # We look if models_data is empty
         if models_data.empty:
             return []
 
+        # We set the deadline of the build (removed at the end of the loading)
+        if time_budget is None:
+            time_budget = self.build_time_budget
+
+        self.deadline = None if time_budget is None else time() + time_budget
+
         # We init the warehouse
         self.__warehouse_init(models_data, ranking)
 
@@ -880,7 +1649,16 @@ class LoadBuilder:
             self.__fill_trailers_empty_spaces()
 
         # We execute the loading of the trailers
-        self.__trailer_packing()
+        if self.trailer_selection == 'set_packing':
+            self.__pooled_trailer_packing(max_load)
+
+        else:  # elif trailer_selection == 'greedy'
+            self.__trailer_packing()
+
+        # We free the memory used by packing results and sanity checks of this build and remove its deadline
+        self.packing_cache.clear()
+        self.sanity_checks.clear()
+        self.deadline = None
 
         # We consider the max
         nb_new_loads = len(self.trailers)
@@ -911,13 +1689,477 @@ def set_trailer_reference(ref):
                                                     h=ref['HEIGHT'][0], p=0, oh=ref['OVERHANG'][0])
 
 
+def get_workers_pool(nb_of_workers):
+
+    """
+    Returns the pool of worker processes used to evaluate configurations of loading
+    (created at the first call or when the number of workers changed)
+
+    :param nb_of_workers: number of processes in the pool
+    :return: Pool object
+    """
+    global workers_pool
+
+    if workers_pool is None or workers_pool[0] != nb_of_workers:
+
+        if workers_pool is not None:
+            workers_pool[1].terminate()
+
+        workers_pool = (nb_of_workers, Pool(nb_of_workers))
+
+    return workers_pool[1]
+
+
+def close_workers_pool():
+
+    """
+    Closes the pool of worker processes and waits for its workers to end (called at the exit of the interpreter)
+    """
+    global workers_pool
+
+    if workers_pool is not None:
+        workers_pool[1].close()
+        workers_pool[1].join()
+        workers_pool = None
+
+
+atexit.register(close_workers_pool)
+
+
+def stacks_dimensions(warehouse):
+
+    """
+    Returns the footprints of the stacks in the warehouse (compact description that can be sent to other processes)
+
+    :param warehouse: Object of class Warehouse
+    :return: list of tuples (width, length, overhang, rotation)
+    """
+    return [(stack.width, stack.length, stack.overhang, stack.rotation) for stack in warehouse]
+
+
+def pack_config(footprints, rids, trailer_dims, config, pack_algo=SkylineBlWm):
+
+    """
+    Packs the stacks of a configuration in the trailer and completes the packing with the stacks left
+
+    :param footprints: list of tuples returned by stacks_dimensions
+    :param rids: list of identifiers given to the rectangles of the stacks
+    :param trailer_dims: tuple with width, length and overhang measure of the trailer
+    :param config: list of boolean indicating if the first stacks are rotated
+    :param pack_algo: skyline algorithm used to pack the trailer
+    :return: packer object
+    """
+    width, length, oh = trailer_dims
+
+    # We initialize a packer with default parameter (except rotation and packing algorithm)
+    packer = newPacker(pack_algo=pack_algo, rotation=False)
+
+    # We add stacks to load in the trailer (the rectangles)
+    for i in range(len(config)):
+
+        # If the rectangle is rotated
+        if config[i]:
+            packer.add_rect(footprints[i][1], footprints[i][0], rid=rids[i], overhang=footprints[i][2])
+
+        else:
+            packer.add_rect(footprints[i][0], footprints[i][1], rid=rids[i], overhang=footprints[i][2])
+
+    # We add other dummy bins to store rectangles that do not enter in our trailer (1st bin)
+    for i in range(2):
+        packer.add_bin(width, length, bid=None, overhang=oh)
+
+    # We execute the packing
+    packer.pack()
+
+    # We complete the packing (look if some unconsidered rectangles could enter at the end)
+    complete_packing(footprints, rids, width, length, packer[0], len(config))
+
+    return packer
+
+
+def complete_packing(footprints, rids, trailer_width, trailer_length, bin, start_index):
+
+    """
+    Verifies if one (or multiple) item unconsidered in the first part of packing fits at the end of the trailer
+
+    :param footprints: list of tuples returned by stacks_dimensions
+    :param rids: list of identifiers given to the rectangles of the stacks
+    :param trailer_width: width of the trailer
+    :param trailer_length: length of the trailer
+    :param bin: bin of the trailer (first bin of the packer)
+    :param start_index: If i is the index of the last item we considered in first part, then start_index = i + 1
+    :returns : number of stacks added
+    """
+
+    # We look if there are items remaining in the warehouse (that were not considered in the first phase of packing)
+    # and if there's still place in the trailer.
+    if len(footprints) != start_index and max([rect.top for rect in bin]) < trailer_length:
+
+        # We save the current number of stack in the trailer
+        last_res = len(bin)
+
+        # We initialize a new packer with rotation not allowed to simply computation and save time
+        # (using the packing algorithm of the bin)
+        new_packer = newPacker(pack_algo=type(bin), rotation=False)
+
+        # We add rectangles unconsidered in the first phase of packing
+        for i in range(start_index, len(footprints)):
+            width, length, overhang, rotation = footprints[i]
+            new_packer.add_rect(width, length, rid=rids[i], overhang=overhang, rect_rotation=rotation)
+
+        # We add a large number of dummy bins
+        for j in range(len(footprints) - start_index + 1):
+            new_packer.add_bin(trailer_width, trailer_length, overhang=bin.overhang_measure)
+
+        # We open the first bin
+        new_packer._open_bins.append(bin)
+
+        # We allow unlock rotation in this first bin.
+        new_packer[0].rot = True
+
+        # We pack the new packer
+        new_packer.pack(reset_opened_bins=False)
+
+        # We return the number of stacks added
+        return len(new_packer[0]) - last_res
+
+    else:
+        return 0
+
+
+def config_of_mask(options, mask):
+
+    """
+    Decodes a configuration of loading encoded by a bitmask. Stacks with a single rotation value allowed keep it and
+    the i-th bit of the mask indicates if the i-th stack with two rotation values takes the second one (rotated).
+    Hence, the rotation of the first stack with two options changes at every configuration, the rotation of the
+    second one every two configurations, and so on.
+
+    :param options: List of tuples of boolean indicating rotation values allowed for each stack
+    :param mask: integer encoding the configuration
+    :return: list of boolean indicating permission of rotation
+    """
+    config = []
+
+    for option in options:
+        if len(option) == 1:
+            config.append(option[0])
+        else:
+            config.append(option[mask & 1])
+            mask >>= 1
+
+    return config
+
+
+def nb_of_configs(classes):
+
+    """
+    Computes the number of configurations that can be done with classes of stacks (see class_masks)
+
+    :param classes: list with the mask bits of the stacks of each class
+    :return: int
+    """
+    return int(np.prod([len(bits) + 1 for bits in classes]))
+
+
+def decision_classes(classes):
+
+    """
+    Returns the class of every rotation decision (bit of the masks) as a bitmask with a single bit set
+
+    :param classes: list with the mask bits of the stacks of each class
+    :return: list of integers (in the order of the decisions)
+    """
+    class_bits = [0] * sum(len(bits) for bits in classes)
+
+    for class_index, bits in enumerate(classes):
+        for bit in bits:
+            class_bits[bit.bit_length() - 1] = 1 << class_index
+
+    return class_bits
+
+
+def class_masks(classes, prefix=(0, 0, 0)):
+
+    """
+    Generates the bitmasks of the configurations in which the stacks rotated in each class are the first ones of the
+    class. Hence, only the number of stacks rotated is chosen for each class.
+    The masks are generated lazily by a depth-first walk of the rotation decisions (in the order of trie_position),
+    where a class is closed once one of its stacks is not rotated. The memory used doesn't depend on the number of
+    configurations.
+
+    :param classes: list with the mask bits of the stacks of each class (in the order of the stacks)
+    :param prefix: tuple with the number of decisions already taken, their bitmask and the bitmask of the classes
+                   closed by them (see class_prefixes). Only the configurations sharing these decisions are generated.
+    :return: generator of bitmasks
+    """
+    class_bits = decision_classes(classes)
+
+    def walk(depth, mask, closed):
+
+        if depth == len(class_bits):
+            yield mask
+            return
+
+        # The stack is not rotated (which closes its class) or rotated if its class is still open
+        yield from walk(depth + 1, mask, closed | class_bits[depth])
+        if not closed & class_bits[depth]:
+            yield from walk(depth + 1, mask | (1 << depth), closed)
+
+    return walk(*prefix)
+
+
+def class_prefixes(classes, nb_of_prefixes):
+
+    """
+    Splits the depth-first walk of the rotation decisions (see class_masks) in subtrees. The subtrees are the ones
+    of the first depth of the walk having at least the number of nodes wanted (or of the last depth).
+
+    :param classes: list with the mask bits of the stacks of each class (in the order of the stacks)
+    :param nb_of_prefixes: number of subtrees wanted
+    :return: list of prefixes of the subtrees (see class_masks) in the order of the walk
+    """
+    class_bits = decision_classes(classes)
+    prefixes = [(0, 0, 0)]
+    depth = 0
+
+    while len(prefixes) < nb_of_prefixes and depth < len(class_bits):
+
+        children = []
+        for _, mask, closed in prefixes:
+            children.append((depth + 1, mask, closed | class_bits[depth]))
+            if not closed & class_bits[depth]:
+                children.append((depth + 1, mask | (1 << depth), closed))
+
+        prefixes = children
+        depth += 1
+
+    return prefixes
+
+
+def trie_position(mask, nb_of_bits):
+
+    """
+    Returns the position of a configuration in the depth-first walk of the rotation decisions done by
+    class_masks (the bits of the mask are read from the first decision to the last one)
+
+    :param mask: integer encoding the configuration (see config_of_mask)
+    :param nb_of_bits: number of stacks with two rotation values allowed
+    :return: int
+    """
+    position = 0
+
+    for i in range(nb_of_bits):
+        position = (position << 1) | ((mask >> i) & 1)
+
+    return position
+
+
+def evaluate_configs(footprints, trailer_dims, options, masks, width_tolerance, deadline=None, target=None,
+                     pack_algo=SkylineBlWm):
+
+    """
+    Packs configurations and returns a compact result for each of them (see packed_configs)
+
+    :param footprints: list of tuples returned by stacks_dimensions
+    :param trailer_dims: tuple with width, length and overhang measure of the trailer
+    :param options: List of tuples of boolean indicating rotation values allowed for each stack
+    :param masks: iterable of bitmasks encoding the configurations to pack (see config_of_mask), in the order of
+                  trie_position
+    :param width_tolerance: segment width used for validation of the length covered
+    :param deadline: moment (in seconds since epoch) after which the remaining configurations are skipped
+    :param target: tuple returned by LoadBuilder.__score_target, the remaining configurations are skipped once a
+                   result reaches it (None = no target)
+    :param pack_algo: skyline algorithm used to pack the trailer
+    :return: list of tuples with the bitmask and the result of the configurations packed before the deadline or the
+             target (in the order of the masks) and boolean indicating if the deadline stopped the packing
+    """
+    width, length, oh = trailer_dims
+
+    # We only need the bin of the trailer since stacks that don't enter it never influence its packing
+    # (the bin of the trailer is always the first one tried)
+    bin = pack_algo(width, length, rot=False, overhang=oh)
+
+    results = []
+    for mask, result in packed_configs(bin, footprints, trailer_dims, options, masks, width_tolerance):
+        results.append((mask, result))
+
+        # We stop if the result can't be beaten by any other configuration
+        if target is not None and reaches_target(result, target):
+            break
+
+        if deadline is not None and time() >= deadline:
+            return results, True
+
+    return results, False
+
+
+def evaluate_prefix(footprints, trailer_dims, options, classes, prefix, saved, width_tolerance, deadline=None,
+                    target=None, pack_algo=SkylineBlWm):
+
+    """
+    Packs the configurations of a subtree of the depth-first walk of the rotation decisions (executed by the
+    workers of the pool, see evaluate_configs)
+
+    :param footprints: list of tuples returned by stacks_dimensions
+    :param trailer_dims: tuple with width, length and overhang measure of the trailer
+    :param options: List of tuples of boolean indicating rotation values allowed for each stack
+    :param classes: list with the mask bits of the stacks of each class (see class_masks)
+    :param prefix: prefix of the subtree (see class_prefixes)
+    :param saved: set of bitmasks of the configurations that must not be packed (results already saved)
+    :param width_tolerance: segment width used for validation of the length covered
+    :param deadline: moment (in seconds since epoch) after which the remaining configurations are skipped
+    :param target: tuple returned by LoadBuilder.__score_target (None = no target)
+    :param pack_algo: skyline algorithm used to pack the trailer
+    :return: same as evaluate_configs
+    """
+    masks = (mask for mask in class_masks(classes, prefix) if mask not in saved)
+
+    return evaluate_configs(footprints, trailer_dims, options, masks, width_tolerance, deadline, target, pack_algo)
+
+
+def packed_configs(bin, footprints, trailer_dims, options, masks, width_tolerance):
+
+    """
+    Packs configurations one after the other and generates their results. The state of the trailer is saved before
+    each decision with two rotation values and a configuration starts from the state saved before the first decision
+    that differs from the last configuration packed. Therefore, with masks in the order of trie_position, rectangles
+    placed before a decision are packed once for all configurations that share them.
+
+    :param bin: empty bin of the trailer
+    :param footprints: list of tuples returned by stacks_dimensions
+    :param trailer_dims: tuple with width, length and overhang measure of the trailer
+    :param options: List of tuples of boolean indicating rotation values allowed for each stack
+    :param masks: iterable of bitmasks encoding the configurations to pack (see config_of_mask)
+    :param width_tolerance: segment width used for validation of the length covered
+    :return: generator of tuples with the bitmask and the result of each configuration (positions of the stacks in
+             the trailer, area used and length covered)
+    """
+    # We save the positions of the stacks with two rotation values (one for each bit of the masks)
+    decisions = [i for i, option in enumerate(options) if len(option) > 1]
+
+    # We initialize the states of the bin before the decisions of the last configuration packed
+    states, last_mask = [], None
+
+    for mask in masks:
+
+        # We restore the state of the bin before the first decision that differs from the last configuration
+        if last_mask is None:
+            first, decision = 0, 0
+        else:
+            difference = mask ^ last_mask
+            decision = (difference & -difference).bit_length() - 1
+            bin.restore(states[decision])
+            del states[decision+1:]
+            first = decisions[decision]
+
+        # We place the stacks from there
+        for i in range(first, len(options)):
+            if len(options[i]) == 1:
+                add_footprint(bin, footprints, i, options[i][0])
+            else:
+                if decision == len(states):
+                    states.append(bin.checkpoint())
+                add_footprint(bin, footprints, i, options[i][(mask >> decision) & 1])
+                decision += 1
+
+        # We complete the packing and generate the result
+        complete_packing(footprints, range(len(footprints)), trailer_dims[0], trailer_dims[1], bin, len(options))
+        last_mask = mask
+
+        yield mask, (tuple(rect.rid for rect in bin), bin.used_area(), bin.covered_length(width_tolerance))
+
+
+def select_loads(loads, capacities, max_nb_of_loads, max_nb_of_nodes):
+
+    """
+    Selects disjoint loads (using different stacks) maximizing their total score with a depth-first branch and
+    bound that includes the best loads first. The first selection explored is therefore the greedy one and the
+    selection returned is optimal if the search ends before exploring the maximal number of nodes.
+
+    :param loads: list of tuples (score, trailer category, set of ids of the stacks used) sorted by decreasing score
+    :param capacities: dictionary with the number of trailers available for each category
+    :param max_nb_of_loads: maximal number of loads that can be selected
+    :param max_nb_of_nodes: maximal number of nodes explored
+    :return: list with the positions of the loads selected
+    """
+    capacities = dict(capacities)
+    best = [0, []]  # Best total score and loads selected
+    nb_of_nodes = [0]
+
+    def explore(i, score, selected, ids_used, nb_of_loads_left):
+
+        nb_of_nodes[0] += 1
+        if score > best[0]:
+            best[0], best[1] = score, list(selected)
+
+        if i == len(loads) or nb_of_loads_left == 0 or nb_of_nodes[0] > max_nb_of_nodes:
+            return
+
+        # We prune the node if the best loads left can't improve the best selection
+        if score + sum(load[0] for load in loads[i:i+nb_of_loads_left]) <= best[0]:
+            return
+
+        # We first include the load if it's possible and then exclude it
+        load_score, category, ids = loads[i]
+        if capacities[category] > 0 and ids_used.isdisjoint(ids):
+            capacities[category] -= 1
+            selected.append(i)
+            explore(i+1, score+load_score, selected, ids_used | ids, nb_of_loads_left-1)
+            selected.pop()
+            capacities[category] += 1
+
+        explore(i+1, score, selected, ids_used, nb_of_loads_left)
+
+    explore(0, 0, [], frozenset(), max_nb_of_loads)
+
+    return best[1]
+
+
+def reaches_target(result, target):
+
+    """
+    Verifies if the result of a configuration gives a qualified load reaching the upper bound of the score
+
+    :param result: tuple with positions of the stacks in the trailer, area used and length covered
+    :param target: tuple returned by LoadBuilder.__score_target
+    :return: boolean
+    """
+    positions, used_area, covered_length = result
+    mandatory, score_multiplication_base, score_bound, length_needed = target
+
+    if covered_length is None or covered_length < length_needed:
+        return False
+
+    # We use a small tolerance for rounding errors
+    return used_area * score_multiplication_base**sum(mandatory[i] for i in positions) >= score_bound * (1 - 1e-9)
+
+
+def add_footprint(bin, footprints, i, rotated):
+
+    """
+    Places the rectangle of a stack in the bin (if possible)
+
+    :param bin: bin of the trailer
+    :param footprints: list of tuples returned by stacks_dimensions
+    :param i: position of the stack (used as identifier of the rectangle)
+    :param rotated: boolean indicating if the stack is rotated
+    """
+    width, length, overhang, _ = footprints[i]
+
+    if rotated:
+        width, length = length, width
+
+    bin.add_rect(width, length, i, overhang, True)
+
+
 def sort_by_volume(warehouse, ranking_effective=False, decreasing_volume=True):
     """
     Sorts stacks to ship by their volumes (and their ranking if True)
     """
     # print('SORT BY VOLUME', ' - RANKING = ', ranking_effective, 'DECREASING = ', decreasing_volume)
     warehouse.sort_by_volume(ranking_effective=ranking_effective, decreasing_volume=decreasing_volume)
-    # print([(stack.average_ranking, stack.length, stack.width) for stack in warehouse.stacks_to_ship], '\n')
+    # print([(stack.average_ranking, stack.length, stack.width) for stack in warehouse], '\n')
 
 
 def sort_by_area(warehouse, ranking_effective=False, decreasing_area=True):
@@ -926,7 +2168,7 @@ def sort_by_area(warehouse, ranking_effective=False, decreasing_area=True):
     """
     # print('SORT BY AREA', ' - RANKING = ', ranking_effective, 'DECREASING = ', decreasing_area)
     warehouse.sort_by_area(ranking_effective=ranking_effective, decreasing_area=decreasing_area)
-    # print([(stack.average_ranking, stack.length, stack.width) for stack in warehouse.stacks_to_ship], '\n')
+    # print([(stack.average_ranking, stack.length, stack.width) for stack in warehouse], '\n')
 
 
 def sort_by_width(warehouse, ranking_effective=False, decreasing_width=True):
@@ -935,7 +2177,7 @@ def sort_by_width(warehouse, ranking_effective=False, decreasing_width=True):
     """
     # print('SORT BY WIDTH', ' - RANKING = ', ranking_effective, 'DECREASING = ', decreasing_width)
     warehouse.sort_by_width(ranking_effective=ranking_effective, decreasing_width=decreasing_width)
-    # print([(stack.average_ranking, stack.length, stack.width) for stack in warehouse.stacks_to_ship], '\n')
+    # print([(stack.average_ranking, stack.length, stack.width) for stack in warehouse], '\n')
 
 
 def sort_by_length(warehouse, ranking_effective=False, decreasing_length=True):
@@ -944,7 +2186,7 @@ def sort_by_length(warehouse, ranking_effective=False, decreasing_length=True):
     """
     # print('SORT BY LENGTH', ' - RANKING = ', ranking_effective, 'DECREASING = ', decreasing_length)
     warehouse.sort_by_length(ranking_effective=ranking_effective, decreasing_length=decreasing_length)
-    # print([(stack.average_ranking, stack.length, stack.width) for stack in warehouse.stacks_to_ship], '\n')
+    # print([(stack.average_ranking, stack.length, stack.width) for stack in warehouse], '\n')
 
 
 def sort_by_ratio(warehouse, ranking_effective=False, decreasing_ratio=True):
@@ -953,5 +2195,5 @@ def sort_by_ratio(warehouse, ranking_effective=False, decreasing_ratio=True):
     """
     # print('SORT BY RATIO', ' - RANKING = ', ranking_effective, 'DECREASING = ', decreasing_ratio)
     warehouse.sort_by_ratio(ranking_effective=ranking_effective, decreasing_ratio=decreasing_ratio)
-    # print([(stack.average_ranking, stack.length, stack.width) for stack in warehouse.stacks_to_ship], '\n')
+    # print([(stack.average_ranking, stack.length, stack.width) for stack in warehouse], '\n')
 
@@ -3,7 +3,7 @@
 Created by Nicolas Raymond on 2019-05-31.
 
 This python file provides all classes of object used during the loading process
-(Crate, Stack, Warehouse, Trailer, CratesManager)
+(CrateType, Crate, Stack, Warehouse, Trailer, CratesManager, PackingCache)
 
 """
 
@@ -12,29 +12,29 @@ import matplotlib.pyplot as plt
 from matplotlib.path import Path
 import matplotlib.patches as patches
 from random import shuffle
+from collections import OrderedDict, Counter
 
 
-class Crate:
+class CrateType:
 
     """
-    Representation of a square-based prism (crate) containing one or many models
+    Representation of the properties shared by all crates of a same model (flyweight never modified once created)
 
     """
+    __slots__ = ('model_names', 'length', 'width', 'height', 'stack_limit', 'overhang', 'rotation', 'type')
 
-    def __init__(self, m_n, l, w, h, s_l, oh, rot, mandatory, ranking, c_type):
+    def __init__(self, m_n, l, w, h, s_l, oh, rot, c_type):
 
         """
 
-        :param m_n: list containing names of the models inside the crate
-        :param l: length of the crate
-        :param w: width of the crate
-        :param h: height of the crate
+        :param m_n: list containing names of the models inside the crates
+        :param l: length of the crates
+        :param w: width of the crates
+        :param h: height of the crates
         :param s_l: maximal quantity of the same crate than can be piled one above the other
-        :param oh: boolean that specifies if the crate is allowed to exceed trailer's length (overhang)
-        :param mandatory: boolean that indicates if the crate is marked as "MANDATORY"
-        :param ranking: integer representing the ranking of the crate
+        :param oh: boolean that specifies if the crates are allowed to exceed trailer's length (overhang)
+        :param rot: bool indicating if the crates can rotate when put it on a load
         :param c_type: one crate type type among 'W' or 'M'
-        :param rot: bool indicating if the crate can rotate when put it on a load
         """
 
         self.model_names = m_n
@@ -43,16 +43,69 @@ class Crate:
         self.height = h
         self.stack_limit = s_l
         self.overhang = oh
+        self.rotation = rot
+        self.type = c_type
+
+
+class Crate:
+
+    """
+    Representation of a square-based prism (crate) containing one or many models
+
+    """
+    __slots__ = ('properties', 'mandatory', 'ranking')
+
+    def __init__(self, properties, mandatory, ranking):
+
+        """
+
+        :param properties: CrateType object with the dimensions and the stacking properties of the crate
+        :param mandatory: boolean that indicates if the crate is marked as "MANDATORY"
+        :param ranking: integer representing the ranking of the crate
+        """
+
+        self.properties = properties
         self.mandatory = mandatory
         self.ranking = ranking
-        self.type = c_type
-        self.rotation = rot
 
     def __repr__(self):
         return self.model_names
 
+    @property
+    def model_names(self):
+        return self.properties.model_names
+
+    @property
+    def length(self):
+        return self.properties.length
+
+    @property
+    def width(self):
+        return self.properties.width
+
+    @property
+    def height(self):
+        return self.properties.height
+
+    @property
+    def stack_limit(self):
+        return self.properties.stack_limit
+
+    @property
+    def overhang(self):
+        return self.properties.overhang
+
+    @property
+    def rotation(self):
+        return self.properties.rotation
+
+    @property
+    def type(self):
+        return self.properties.type
+
     def volume(self):
-        return self.length*self.width*self.height
+        properties = self.properties
+        return properties.length*properties.width*properties.height
 
     def stackable(self, upper_crate):
         """
@@ -61,13 +114,19 @@ class Crate:
         :param upper_crate Other crate
         :return: True or False
         """
-        if self.type == 'W':
-            if upper_crate.length <= self.length:
-                if self.width - 6 <= upper_crate.width <= self.width:
+        lower, upper = self.properties, upper_crate.properties
+
+        # Crates of the same type can always be piled
+        if lower is upper:
+            return True
+
+        if lower.type == 'W':
+            if upper.length <= lower.length:
+                if lower.width - 6 <= upper.width <= lower.width:
                     return True
 
         else:  # elif type == 'M'
-            if upper_crate.length == self.length and upper_crate.width == self.width:
+            if upper.length == lower.length and upper.width == lower.width:
                 return True
 
 
@@ -77,32 +136,49 @@ class Stack:
     Representation of a pile of crates
 
     """
+    __slots__ = ('crates', 'length', 'width', 'height', 'volume', 'crates_type', 'overhang', 'rotation',
+                 'nb_of_mandatory', 'ranking_sum', 'average_ranking', 'nb_of_units', 'model_counts', 'completed')
 
     def __init__(self, crates):
 
         """
         :param crates: list of the crates that will be contained in the stack
         """
+        bottom = crates[0]
+
+        self.crates = [bottom]
+        self.length = bottom.length
+        self.width = bottom.width
+        self.height = bottom.height
+        self.volume = bottom.volume()
+        self.crates_type = bottom.type
+        self.overhang = bottom.overhang  # We look if the bottom crate can overhang
+        self.rotation = bottom.rotation  # We look if the bottom crate can rotate
+        self.nb_of_mandatory = int(bottom.mandatory)
+        self.ranking_sum = bottom.ranking
+        self.average_ranking = float(bottom.ranking)
+        self.nb_of_units = len(bottom.model_names)
+        self.model_counts = Counter(bottom.model_names)  # Number of units of each model in the stack
+        self.completed = (bottom.stack_limit == 1)
 
-        self.length = max([crate.length for crate in crates])
-        self.width = max([crate.width for crate in crates])
-        self.height = sum([crate.height for crate in crates])
-        self.volume = sum([crate.volume() for crate in crates])
-        self.crates = crates
-        self.crates_type = crates[0].type
-        self.models = sum([crate.model_names for crate in crates], [])
-        self.overhang = crates[0].overhang  # We look if the bottom crate can overhang
-        self.nb_of_mandatory = sum([crate.mandatory for crate in crates])
-        self.average_ranking = np.mean([crate.ranking for crate in crates])
-        self.completed = (crates[0].stack_limit == len(crates))
-        self.rotation = crates[0].rotation  # We look if the bottom crate can rotate
+        for crate in crates[1:]:
+            self.add_crate(crate)
+
+    @property
+    def models(self):
+
+        """
+        Returns the names of the models in the stack (from the bottom crate to the top crate).
+        Use model_counts when the order of the models doesn't matter.
+        """
+        return [model for crate in self.crates for model in crate.model_names]
 
     def nbr_of_models(self):
 
         """
         Computes the number of models in the stack (int)
         """
-        return len(self.models)
+        return self.nb_of_units
 
     def better_rotated(self, trailer):
 
@@ -136,7 +212,17 @@ class Stack:
         """
         Adds a crate on the top of the stack and update all his attribute
         """
-        self.__init__(crates=self.crates + [crate])
+        self.crates.append(crate)
+        self.length = max(self.length, crate.length)
+        self.width = max(self.width, crate.width)
+        self.height += crate.height
+        self.volume += crate.volume()
+        self.nb_of_mandatory += crate.mandatory
+        self.ranking_sum += crate.ranking
+        self.average_ranking = self.ranking_sum / len(self.crates)
+        self.nb_of_units += len(crate.model_names)
+        self.model_counts.update(crate.model_names)
+        self.completed = (self.crates[0].stack_limit == len(self.crates))
 
     def area(self):
         """
@@ -318,16 +404,14 @@ class Trailer:
         """
         Returns the quantities of every models in the trailer
 
-        :return: list of size_codes
+        :return: Counter with the number of units of each size code
         """
 
-        # Initialization of an empty list that will contain all model names in the trailer
-        models = []
+        # Initialization of an empty counter that will contain the quantities of all models in the trailer
+        models = Counter()
 
         for stack in self.load:
-
-            for model in stack.models:
-                models.append(model)
+            models.update(stack.model_counts)
 
         return models
 
@@ -340,8 +424,8 @@ class Trailer:
         """
 
         for stack in self.load:
-            for model in stack.models:
-                unused_crates_list.append((model, self.crate_type))
+            for model, count in stack.model_counts.items():
+                unused_crates_list.extend([(model, self.crate_type)] * count)
 
         self.load.clear()
 
@@ -394,14 +478,40 @@ class Warehouse:
     Representation of a warehouse containing all stacks that we have to ship with trailers available
 
     """
+    max_dead_fraction = 0.25  # Fraction of removed stacks kept as tombstones in stacks_to_ship before its compaction
+
     def __init__(self):
-        self.stacks_to_ship = []  # List containing stacks to ship
+        self.stacks_to_ship = []  # List containing stacks to ship (None at the positions of the stacks removed)
+        self.slots = {}  # Dictionary with the position of each stack in stacks_to_ship (using their ids as keys)
+        self.nb_of_dead = 0  # Number of stacks removed that are still marked in stacks_to_ship
+        self.orderings = {}  # Dictionary with the rank of every stack in each ordering used (see sort_stacks)
 
     def __getitem__(self, key):
+
+        # We remove the tombstones since the positions given are the ones of the stacks left
+        if self.nb_of_dead != 0:
+            self.compact()
+
         return self.stacks_to_ship[key]
 
+    def __iter__(self):
+        return (stack for stack in self.stacks_to_ship if stack is not None)
+
+    def __getstate__(self):
+
+        # We don't copy the positions saved since the ids of the stacks change when the warehouse is copied
+        # or sent to another process
+        state = dict(self.__dict__)
+        del state['slots']
+
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.index_slots()
+
     def __len__(self):
-        return len(self.stacks_to_ship)
+        return len(self.stacks_to_ship) - self.nb_of_dead
 
     def not_empty(self):
 
@@ -410,15 +520,32 @@ class Warehouse:
 
         :return : boolean (True if yes, False if no)
         """
-        return len(self.stacks_to_ship) != 0
+        return len(self) != 0
 
     def clear(self):
 
         """
         Removes all stacks from the warehouse
         """
-        while self.not_empty():
-            self.stacks_to_ship.pop()
+        self.stacks_to_ship.clear()
+        self.slots.clear()
+        self.nb_of_dead = 0
+
+    def compact(self):
+
+        """
+        Removes the tombstones of the stacks removed from stacks_to_ship and saves the new positions of the stacks
+        """
+        self.stacks_to_ship[:] = [stack for stack in self.stacks_to_ship if stack is not None]
+        self.nb_of_dead = 0
+        self.index_slots()
+
+    def index_slots(self):
+
+        """
+        Saves the position of each stack in stacks_to_ship (needed after the stacks moved)
+        """
+        self.slots = {id(stack): index for index, stack in enumerate(self.stacks_to_ship) if stack is not None}
 
     def add_stack(self, stack):
 
@@ -427,91 +554,142 @@ class Warehouse:
 
         :param stack: stack object
         """
+        self.slots[id(stack)] = len(self.stacks_to_ship)
         self.stacks_to_ship.append(stack)
 
     def remove_stacks(self, indexes):
 
         """
-        Removes all stacks at the positions indicated in the list of indexes
+        Removes all stacks at the positions indicated in the list of indexes (positions given by get_stack_by_id).
+        Stacks are replaced by tombstones, so the other stacks keep their positions, and stacks_to_ship is compacted
+        when the fraction of tombstones exceeds max_dead_fraction. Their ranks are removed from the orderings.
 
         :param indexes: list of indexes
         """
+        for index in set(indexes):
+            stack = self.stacks_to_ship[index]
+            del self.slots[id(stack)]
+            for ranks in self.orderings.values():
+                ranks.pop(stack, None)
 
-        # We sort indexes in decreasing order to avoid conflict with stacks positions during the process
-        indexes.sort(reverse=True)
+            self.stacks_to_ship[index] = None
+            self.nb_of_dead += 1
+
+        if self.nb_of_dead > self.max_dead_fraction * len(self.stacks_to_ship):
+            self.compact()
+
+    def move_stacks_to_end(self, indexes):
 
-        for i in indexes:
-            self.stacks_to_ship.pop(i)
+        """
+        Moves the stacks at the positions indicated at the end of the warehouse (in the order of the indexes)
+
+        :param indexes: list of indexes
+        """
+        if self.nb_of_dead != 0:
+            self.compact()
+
+        moved = set(indexes)
+        self.stacks_to_ship[:] = [stack for i, stack in enumerate(self.stacks_to_ship) if i not in moved] + \
+                                 [self.stacks_to_ship[i] for i in indexes]
+        self.index_slots()
+
+    def view(self, identifiers):
+
+        """
+        Returns a warehouse sharing the stacks whose ids are given (in their actual order).
+        Stacks are not copied, so they must not be modified through the view.
+
+        :param identifiers: set of ids of the stacks wanted
+        :return: Warehouse object
+        """
+        warehouse = Warehouse()
+        warehouse.stacks_to_ship = [stack for stack in self if id(stack) in identifiers]
+        warehouse.index_slots()
+        warehouse.orderings = {ordering: {stack: ranks[stack] for stack in warehouse if stack in ranks}
+                               for ordering, ranks in self.orderings.items()}
+
+        return warehouse
 
     def get_stack_by_id(self, identifier):
         """
         Returns the stack associated to the id and his position index
         :param identifier: id of the stack wanted
-        :return: stack and id
+        :return: stack and id (None if the stack is not in the warehouse)
         """
-        for index, stack in enumerate(self.stacks_to_ship):
-            if id(stack) == identifier:
-                return stack, index
+        index = self.slots.get(identifier)
+
+        if index is None:
+            return None
+
+        return self.stacks_to_ship[index], index
 
     def sort_by_volume(self, ranking_effective=False, decreasing_volume=True):
         """
         Sorts stacks to ship by their volume (and their ranking if True)
         """
-        if ranking_effective:
-            if decreasing_volume:
-                self.stacks_to_ship.sort(key=lambda s: (-1 * s.volume, s.average_ranking))
-            else:
-                self.stacks_to_ship.sort(key=lambda s: (s.volume, s.average_ranking))
-        else:
-            self.stacks_to_ship.sort(key=lambda s: s.volume, reverse=decreasing_volume)
+        self.sort_stacks(('volume', ranking_effective, decreasing_volume), lambda s: s.volume)
 
     def sort_by_area(self, ranking_effective=False, decreasing_area=True):
         """
         Sorts stacks by their area (and their ranking if True)
         """
-        if ranking_effective:
-            if decreasing_area:
-                self.stacks_to_ship.sort(key=lambda s: (-1 * s.area(), s.average_ranking))
-            else:
-                self.stacks_to_ship.sort(key=lambda s: (s.area(), s.average_ranking))
-        else:
-            self.stacks_to_ship.sort(key=lambda s: s.area(), reverse=decreasing_area)
+        self.sort_stacks(('area', ranking_effective, decreasing_area), lambda s: s.area())
 
     def sort_by_width(self, ranking_effective=False, decreasing_width=True):
         """
         Sorts stacks by their width (and their ranking if True)
         """
-        if ranking_effective:
-            if decreasing_width:
-                self.stacks_to_ship.sort(key=lambda s: (-1 * s.width, s.average_ranking))
-            else:
-                self.stacks_to_ship.sort(key=lambda s: (s.width, s.average_ranking))
-        else:
-            self.stacks_to_ship.sort(key=lambda s: s.width, reverse=decreasing_width)
+        self.sort_stacks(('width', ranking_effective, decreasing_width), lambda s: s.width)
 
     def sort_by_length(self, ranking_effective=False, decreasing_length=True):
         """
         Sorts stacks by their length (and their ranking if True)
         """
-        if ranking_effective:
-            if decreasing_length:
-                self.stacks_to_ship.sort(key=lambda s: (-1 * s.length, s.average_ranking))
-            else:
-                self.stacks_to_ship.sort(key=lambda s: (s.length, s.average_ranking))
-        else:
-            self.stacks_to_ship.sort(key=lambda s: s.length, reverse=decreasing_length)
+        self.sort_stacks(('length', ranking_effective, decreasing_length), lambda s: s.length)
 
     def sort_by_ratio(self, ranking_effective=False, decreasing_ratio=True):
         """
         Sorts stacks by their ratio length on width (and their ranking if True)
         """
-        if ranking_effective:
-            if decreasing_ratio:
-                self.stacks_to_ship.sort(key=lambda s: (-1 * (s.length/s.width), s.average_ranking))
+        self.sort_stacks(('ratio', ranking_effective, decreasing_ratio), lambda s: s.length/s.width)
+
+    def sort_stacks(self, ordering, measure):
+
+        """
+        Sorts stacks in an ordering using the ranks of the stacks in this ordering. The ranks are computed once for
+        all stacks of the warehouse, hence the sort only compares integers. They are kept when stacks are removed
+        (the ranks of the stacks left keep their order) and computed again when stacks without rank were added.
+        Stacks having the same rank keep their actual order (as with a sort on the measure itself).
+
+        :param ordering: tuple with the name of the measure, a boolean indicating if the ranking is considered and
+                         a boolean indicating if the measure is decreasing
+        :param measure: function returning the measure of a stack
+        """
+        # We remove the tombstones of the stacks removed since the positions of all stacks change anyway
+        if self.nb_of_dead != 0:
+            self.stacks_to_ship[:] = [stack for stack in self.stacks_to_ship if stack is not None]
+            self.nb_of_dead = 0
+
+        try:
+            self.stacks_to_ship.sort(key=self.orderings[ordering].__getitem__)
+
+        # We compute the ranks if some stacks were never ranked in this ordering (the stacks keep their order
+        # when a key is missing since all keys are computed before the sort)
+        except KeyError:
+
+            sign = -1 if ordering[2] else 1
+            if ordering[1]:
+                keys = {stack: (sign * measure(stack), stack.average_ranking) for stack in self.stacks_to_ship}
             else:
-                self.stacks_to_ship.sort(key=lambda s: ((s.length / s.width), s.average_ranking))
-        else:
-            self.stacks_to_ship.sort(key=lambda s: s.length/s.width, reverse=decreasing_ratio)
+                keys = {stack: sign * measure(stack) for stack in self.stacks_to_ship}
+
+            positions = {key: rank for rank, key in enumerate(sorted(set(keys.values())))}
+            ranks = {stack: positions[key] for stack, key in keys.items()}
+            self.orderings[ordering] = ranks
+
+            self.stacks_to_ship.sort(key=ranks.__getitem__)
+
+        self.index_slots()
 
     def save_unused_crates(self, unused_crates_list):
 
@@ -520,11 +698,15 @@ class Warehouse:
 
         :param unused_crates_list: list of model names
         """
-        for stack in self.stacks_to_ship:
-            for model in stack.models:
-                unused_crates_list.append((model, stack.crates_type))
+        for stack in self:
+            for model, count in stack.model_counts.items():
+                unused_crates_list.extend([(model, stack.crates_type)] * count)
 
-        self.stacks_to_ship.clear()
+        # We remove the ranks of the stacks since all of them left the warehouse
+        for ranks in self.orderings.values():
+            ranks.clear()
+
+        self.clear()
 
     def merge_for_trailer(self, trailer, width_tolerance):
 
@@ -538,7 +720,7 @@ class Warehouse:
 
         """
         # We save the length of the longest element in the warehouse
-        unique_tuples = set((stack.width, stack.length) for stack in self.stacks_to_ship)
+        unique_tuples = set((stack.width, stack.length) for stack in self)
         longest_item_length = max(max(dimensions) for dimensions in unique_tuples)
 
         # Initialization of a new warehouse
@@ -613,7 +795,7 @@ class Warehouse:
         self.clear()
 
         # We introduce back our stacks in the new order
-        self.stacks_to_ship = new.stacks_to_ship
+        self.stacks_to_ship, self.slots = new.stacks_to_ship, new.slots
 
         # We return the configuration list with booleans
         return config, len(leftover)
@@ -827,7 +1009,60 @@ class CratesManager:
         self.remove_crates(used_crates)
 
 
+class PackingCache:
+
+    """
+    Memory of packing results with least recently used eviction.
+    Keys must describe completely the packing (footprints of stacks, rotations and trailer geometry).
+    """
+
+    def __init__(self, max_size):
+
+        """
+        :param max_size: maximal number of results kept in memory
+        """
+        self.results = OrderedDict()
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.results)
+
+    def get(self, key):
+
+        """
+        Returns the result associated to the key (None if there's no result saved for it)
+
+        :param key: hashable description of the packing
+        """
+        result = self.results.get(key)
+
+        if result is None:
+            self.misses += 1
+
+        else:
+            self.hits += 1
+            self.results.move_to_end(key)
 
+        return result
 
+    def add(self, key, result):
 
+        """
+        Saves a result and removes the least recently used one if the memory is full
 
+        :param key: hashable description of the packing
+        :param result: result of the packing
+        """
+        self.results[key] = result
+
+        if len(self.results) > self.max_size:
+            self.results.popitem(last=False)
+
+    def clear(self):
+
+        """
+        Removes all results saved (hits and misses counters are kept)
+        """
+        self.results.clear()
@@ -0,0 +1,179 @@
+"""
+Upper bounds of the loads that can be obtained in a trailer with the stacks of a warehouse.
+A search of loads can stop as soon as it finds a load reaching these bounds since no other load can beat it.
+"""
+from collections import Counter
+
+
+def orientations(footprints, trailer_dims, options=()):
+
+    """
+    Returns the orientations allowed of every stack that can enter the trailer
+
+    :param footprints: list of tuples returned by stacks_dimensions (see LoadBuilder)
+    :param trailer_dims: tuple with width, length and overhang measure of the trailer
+    :param options: List of tuples of boolean indicating rotation values allowed for the first stacks
+                    (the other stacks can be rotated if their rotation is allowed)
+    :return: list of tuples (position of the stack, area, list of tuples (width, length) of orientations that fit)
+    """
+    width, length, oh = trailer_dims
+
+    stacks = []
+    for i, (stack_width, stack_length, overhang, rotation) in enumerate(footprints):
+
+        # We save the rotation values allowed for the stack
+        if i < len(options):
+            rotation_values = options[i]
+        else:
+            rotation_values = (False, True) if rotation else (False,)
+
+        # We keep the orientations that fit in the trailer (considering the overhang if the stack can use it)
+        fitting = []
+        for rotated in rotation_values:
+            w, l = (stack_length, stack_width) if rotated else (stack_width, stack_length)
+            if w <= width and l <= length + overhang * oh:
+                fitting.append((w, l))
+
+        if len(fitting) > 0:
+            stacks.append((i, stack_width * stack_length, fitting))
+
+    return stacks
+
+
+def reduced_width(stacks, width):
+
+    """
+    Computes the largest width of the trailer that can be covered by stacks placed side by side.
+    Any line crossing the trailer over its width meets stacks whose widths sum to at most this value.
+
+    :param stacks: list of tuples returned by orientations
+    :param width: width of the trailer
+    :return: width (float)
+    """
+    # We group stacks having the same widths allowed
+    groups = Counter(tuple(sorted(set(w for w, _ in fitting))) for _, _, fitting in stacks)
+
+    # We compute all sums of widths that can be obtained with the stacks of each group
+    sums = {0}
+    for widths, nb_of_stacks in groups.items():
+        for _ in range(min(nb_of_stacks, int(width // widths[0]))):
+            new_sums = set(s + w for s in sums for w in widths if s + w <= width) - sums
+            if len(new_sums) == 0:
+                break
+            sums |= new_sums
+
+    return max(sums)
+
+
+def area_upperbound(stacks, trailer_dims):
+
+    """
+    Computes the continuous bound of the area that can be used in the trailer (stacks could be split to fill
+    exactly the surface of the trailer that can be covered, see reduced_width)
+
+    :param stacks: list of tuples returned by orientations
+    :param trailer_dims: tuple with width, length and overhang measure of the trailer
+    :return: area (float)
+    """
+    width, length, oh = trailer_dims
+
+    return min(sum(area for _, area, _ in stacks), reduced_width(stacks, width) * (length + oh))
+
+
+def width_upperbound(stacks, trailer_dims):
+
+    """
+    Computes a bound of the area that can be used in the trailer based on the width of the stacks (L2-style bound).
+
+    For a threshold p <= width/2, a "large" stack (wider than width - p in every orientation) can't be placed side by
+    side with another large stack or with a "medium" stack (at least as wide as p in every orientation). Hence, along
+    the length of the trailer, large stacks are placed one after the other and medium stacks can only use the length
+    that large stacks leave. Large stacks are split to fill the length considered for them (the widest first),
+    which is chosen to maximize the area.
+
+    :param stacks: list of tuples returned by orientations
+    :param trailer_dims: tuple with width, length and overhang measure of the trailer
+    :return: area (float)
+    """
+    width, length, oh = trailer_dims
+    total_length = length + oh
+
+    # We save the smallest and the largest width of every stack (the largest width gives the smallest length)
+    widths = [(area, min(w for w, _ in fitting), max(w for w, _ in fitting)) for _, area, fitting in stacks]
+
+    # We try every threshold given by the width of a stack (the width of a large stack must be more than width/2)
+    best_bound = area_upperbound(stacks, trailer_dims)
+    thresholds = set(min_width for _, min_width, _ in widths if min_width <= width / 2)
+
+    for p in thresholds:
+
+        large, medium_area, small_area = [], 0, 0
+        for area, min_width, max_width in widths:
+            if min_width > width - p:
+                large.append((max_width, area / max_width))
+            elif min_width >= p:
+                medium_area += area
+            else:
+                small_area += area
+
+        # We compute the length that large stacks should use (the area of large stacks grows by less than the
+        # width of the trailer per unit of length, so medium stacks must have all the length they can fill)
+        large_length = max(0, min(sum(l for _, l in large), total_length - medium_area / width))
+
+        # We fill this length with the widest large stacks first
+        large_area, length_left = 0, large_length
+        for max_width, l in sorted(large, reverse=True):
+            large_area += max_width * min(l, length_left)
+            length_left -= min(l, length_left)
+
+        bound = large_area + min(medium_area, width * (total_length - large_length)) + small_area
+        best_bound = min(best_bound, bound)
+
+    return best_bound
+
+
+def mandatory_upperbound(mandatory_stacks, free_area):
+
+    """
+    Computes an upper bound of the number of mandatory crates that can still enter the trailer,
+    considering that stacks could be split to fill exactly the free area left
+
+    :param mandatory_stacks: list of tuples with area and number of mandatory crates of stacks (sorted by ratio)
+    :param free_area: area still available in the trailer
+    :return: number of mandatory crates (float)
+    """
+    nb_of_mandatory = 0
+
+    for area, mandatory in mandatory_stacks:
+
+        if area <= free_area:
+            nb_of_mandatory += mandatory
+            free_area -= area
+
+        else:
+            nb_of_mandatory += mandatory * free_area / area
+            break
+
+    return nb_of_mandatory
+
+
+def score_upperbound(footprints, mandatory, trailer_dims, score_multiplication_base, options=()):
+
+    """
+    Computes an upper bound of the score (used area boosted by mandatory crates) of the loads that can be obtained
+
+    :param footprints: list of tuples returned by stacks_dimensions (see LoadBuilder)
+    :param mandatory: list with the number of mandatory crates of each stack
+    :param trailer_dims: tuple with width, length and overhang measure of the trailer
+    :param score_multiplication_base: base used to boost the score of a load when there's mandatory crates
+    :param options: List of tuples of boolean indicating rotation values allowed for the first stacks
+    :return: score (float)
+    """
+    stacks = orientations(footprints, trailer_dims, options)
+    max_area = width_upperbound(stacks, trailer_dims)
+
+    # We sort the stacks with mandatory crates by their area per mandatory crate
+    mandatory_stacks = sorted([(area, mandatory[i]) for i, area, _ in stacks if mandatory[i] > 0],
+                              key=lambda s: s[0]/s[1])
+
+    return max_area * score_multiplication_base**mandatory_upperbound(mandatory_stacks, max_area)
@@ -26,22 +26,33 @@ def float2dec(ft, decimal_digits):
         return decimal.Decimal.from_float(float(ft)).quantize(places)
 
 
-# Sorting algos for rectangle lists
-SORT_AREA = lambda rectlist: sorted(rectlist, reverse=True, key=lambda r: r[0]*r[1])  # Sort by area
+# Sorting algos for rectangle lists (functions defined at module level such that packers can be pickled)
+def SORT_AREA(rectlist):
+    return sorted(rectlist, reverse=True, key=lambda r: r[0]*r[1])  # Sort by area
 
-SORT_PERI = lambda rectlist: sorted(rectlist, reverse=True, key=lambda r: r[0]+r[1])  # Sort by perimeter
 
-SORT_DIFF = lambda rectlist: sorted(rectlist, reverse=True, key=lambda r: abs(r[0]-r[1]))  # Sort by Diff
+def SORT_PERI(rectlist):
+    return sorted(rectlist, reverse=True, key=lambda r: r[0]+r[1])  # Sort by perimeter
 
-SORT_SSIDE = lambda rectlist: sorted(rectlist, reverse=True,
-                                     key=lambda r: (min(r[0], r[1]), max(r[0], r[1])))  # Sort by short side
 
-SORT_LSIDE = lambda rectlist: sorted(rectlist, reverse=True,
-                                     key=lambda r: (max(r[0], r[1]), min(r[0], r[1])))  # Sort by long side
+def SORT_DIFF(rectlist):
+    return sorted(rectlist, reverse=True, key=lambda r: abs(r[0]-r[1]))  # Sort by Diff
 
-SORT_RATIO = lambda rectlist: sorted(rectlist, reverse=True, key=lambda r: r[0]/r[1])  # Sort by side ratio
 
-SORT_NONE = lambda rectlist: list(rectlist)  # Unsorted
+def SORT_SSIDE(rectlist):
+    return sorted(rectlist, reverse=True, key=lambda r: (min(r[0], r[1]), max(r[0], r[1])))  # Sort by short side
+
+
+def SORT_LSIDE(rectlist):
+    return sorted(rectlist, reverse=True, key=lambda r: (max(r[0], r[1]), min(r[0], r[1])))  # Sort by long side
+
+
+def SORT_RATIO(rectlist):
+    return sorted(rectlist, reverse=True, key=lambda r: r[0]/r[1])  # Sort by side ratio
+
+
+def SORT_NONE(rectlist):
+    return list(rectlist)  # Unsorted
 
 
 class BinFactory(object):
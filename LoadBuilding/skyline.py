@@ -1,6 +1,8 @@
 import collections
 import operator
 import heapq
+import bisect
+import numpy as np
 from pack_algo import PackingAlgorithm
 from geometry import Point as P
 from geometry import HSegment, Rectangle
@@ -65,23 +67,22 @@ class Skyline(PackingAlgorithm):
     def _generate_placements(self, width, height, overhang):
 
         """
-        Generate a list with 
+        Generate the valid positions of the rectangle. Positions are given as plain
+        coordinates, only the position selected is turned into a Rectangle.
 
         Arguments:
             height (number): height of rectangle
             width (number): width of rectangle
             overhang (bool) : indicator of overhang permission
 
-        Returns:
-            tuple (Rectangle, fitness):
-                Rectangle: Rectangle in valid position
+        Yields:
+            tuple (x, y, left_skyline, right_skyline):
+                x, y: Bottom left corner of the rectangle in valid position
                 left_skyline: Index for the skyline under the rectangle left edge.
                 right_skyline: Index for the skyline under the rectangle right edte.
         """
         skyline = self._skyline
 
-        points = collections.deque()
-
         left_index = right_index = 0  # Left and right side skyline index
         support_height = skyline[0].top
         support_index = 0 
@@ -114,9 +115,7 @@ class Skyline(PackingAlgorithm):
             # Add point if there is enough room at the top
             if support_height+height <= self.height + int(overhang)*self.overhang_measure and \
                     support_height + int(overhang)*self.SBOT*height <= self.height:
-                points.append((Rectangle(p, support_height, width, height), left_index, right_index))
-
-        return points
+                yield p, support_height, left_index, right_index
 
     @staticmethod
     def _merge_skyline(skylineq, segment):
@@ -175,8 +174,8 @@ class Skyline(PackingAlgorithm):
 
         self._skyline = list(skylineq)
 
-    def _rect_fitness(self, rect, left_index, right_index):
-        return rect.top
+    def _rect_fitness(self, x, y, width, height, left_index, right_index):
+        return y+height
 
     def _select_position(self, width, height, overhang, rect_rotation):
         """
@@ -189,12 +188,23 @@ class Skyline(PackingAlgorithm):
             tuple (Rectangle, fitness) - Rectangle placed in the fittest position
             None - Rectangle couldn't be placed
         """
-        positions = self._generate_placements(width, height, overhang)
+        orientations = [(width, height)]
         if self.rot and rect_rotation and width != height:
-            positions += self._generate_placements(height, width, overhang)
-        if not positions:
+            orientations.append((height, width))
+
+        # We keep the first position with the best fitness (the non rotated ones come first)
+        best = None
+        for w, h in orientations:
+            for x, y, left_index, right_index in self._generate_placements(w, h, overhang):
+                fitness = self._rect_fitness(x, y, w, h, left_index, right_index)
+                if best is None or fitness < best[0]:
+                    best = (fitness, x, y, w, h)
+
+        if best is None:
             return None, None
-        return min(((p[0], self._rect_fitness(*p))for p in positions), key=operator.itemgetter(1))
+
+        fitness, x, y, w, h = best
+        return Rectangle(x, y, w, h), fitness
 
     def fitness(self, width, height, overhang, rect_rotation):
         """Search for the best fitness 
@@ -255,6 +265,49 @@ class Skyline(PackingAlgorithm):
         self.rectangles.append(rect)
         return rect
 
+    def free_area(self, width, height, overhang=False):
+        """
+        Computes the area still available to place new rectangles (above the skyline and in wasted sections)
+        that are at least as large as the dimensions given in both directions.
+
+        Arguments:
+            width (int, float): smallest width of the rectangles that could be placed
+            height (int, float): smallest height of the rectangles that could be placed
+            overhang (bool): indicator of overhang permission
+
+        Returns:
+            int, float: Area
+        """
+        top = self.height + int(overhang)*self.overhang_measure
+        free = sum((top - seg.top)*seg.length for seg in self._skyline if top - seg.top >= height)
+
+        if self._waste_management:
+            free += sum(section.area() for section in self._waste._sections
+                        if section.width >= width and section.height >= height)
+
+        return free
+
+    def checkpoint(self):
+        """
+        Saves the state of the surface such that it can be restored later.
+        Skyline segments are never modified once created, hence only the references are saved.
+
+        Returns:
+            tuple: State of the surface (used by restore)
+        """
+        return len(self.rectangles), self._skyline, self.rot, self._waste.checkpoint()
+
+    def restore(self, state):
+        """
+        Restores a state of the surface saved by checkpoint (rectangles added since then are removed)
+
+        Arguments:
+            state (tuple): State returned by checkpoint
+        """
+        nb_of_rectangles, self._skyline, self.rot, waste_state = state
+        del self.rectangles[nb_of_rectangles:]
+        self._waste.restore(waste_state)
+
     def reset(self):
         super(Skyline, self).reset()
         self._skyline = [HSegment(P(0, 0), self.width)]
@@ -273,18 +326,18 @@ class SkylineMwf(Skyline):
     """Implements Min Waste fit heuristic, minimizing the area wasted under the
     rectangle.
     """
-    def _rect_fitness(self, rect, left_index, right_index):
+    def _rect_fitness(self, x, y, width, height, left_index, right_index):
         waste = 0
         for seg in self._skyline[left_index:right_index+1]:
             waste +=\
-                (min(rect.right, seg.right)-max(rect.left, seg.left)) *\
-                (rect.bottom-seg.top)
+                (min(x+width, seg.right)-max(x, seg.left)) *\
+                (y-seg.top)
 
         return waste
 
-    def _rect_fitnes2s(self, rect, left_index, right_index):
+    def _rect_fitnes2s(self, x, y, width, height, left_index, right_index):
 
-        waste = ((min(rect.right, seg.right)-max(rect.left, seg.left))
+        waste = ((min(x+width, seg.right)-max(x, seg.left))
                  for seg in self._skyline[left_index:right_index+1])
 
         return sum(waste)
@@ -295,14 +348,14 @@ class SkylineMwfl(Skyline):
     wasted below the rectangle, at the same time it tries to keep the height
     minimal.
     """ 
-    def _rect_fitness(self, rect, left_index, right_index):
+    def _rect_fitness(self, x, y, width, height, left_index, right_index):
         waste = 0
         for seg in self._skyline[left_index:right_index+1]:
             waste +=\
-                (min(rect.right, seg.right)-max(rect.left, seg.left)) *\
-                (rect.bottom-seg.top)
+                (min(x+width, seg.right)-max(x, seg.left)) *\
+                (y-seg.top)
 
-        return waste*self.width*self.height+rect.top
+        return waste*self.width*self.height+y+height
 
 
 class SkylineBl(Skyline):
@@ -310,8 +363,8 @@ class SkylineBl(Skyline):
     results in which the top side of the rectangle lies at the bottom-most 
     position.
     """
-    def _rect_fitness(self, rect, left_index, right_index):
-        return rect.top
+    def _rect_fitness(self, x, y, width, height, left_index, right_index):
+        return y+height
 
     def valid_length(self, lower_bound, width_of_segment):
         """
@@ -321,14 +374,26 @@ class SkylineBl(Skyline):
         :param width_of_segment: segment width used for validation
         :return: length (float)
         """
-        length_to_satisfy = lower_bound * self.height
+        covered_length = self.covered_length(width_of_segment)
+
+        return covered_length is not None and covered_length >= lower_bound * self.height
+
+    def covered_length(self, width_of_segment):
+        """
+        Computes the longest length reached by skyline segments of total width equal or greater than the width given
+
+        :param width_of_segment: segment width used for validation
+        :return: length (float) or None if the skyline is not wide enough
+        """
         valid_skyline_length = 0
 
-        for horizontal_segment in self._skyline:
-            if horizontal_segment.top >= length_to_satisfy:
-                valid_skyline_length += horizontal_segment.length
+        for horizontal_segment in sorted(self._skyline, key=lambda s: s.top, reverse=True):
+            valid_skyline_length += horizontal_segment.length
 
-        return valid_skyline_length >= width_of_segment
+            if valid_skyline_length >= width_of_segment:
+                return horizontal_segment.top
+
+        return None
 
 
 class SkylineBlWm(SkylineBl, SkylineWMixin):
@@ -341,3 +406,579 @@ class SkylineMwfWm(SkylineMwf, SkylineWMixin):
 
 class SkylineMwflWm(SkylineMwfl, SkylineWMixin):
     pass
+
+
+class ArraySkyline(Skyline):
+
+    """
+    Skyline storing its segments in parallel lists instead of HSegment objects.
+
+    _skyline: tuple of three lists with the x coordinate of the left end, the y coordinate and the x coordinate of
+    the right end of each segment. The lists are replaced (never modified) when a rectangle is added, hence
+    checkpoint and restore only save references as with HSegment objects.
+
+    The coordinates are computed with the same operations as HSegment objects, which gives the same placements.
+
+    When the skyline has many segments, the placements of both orientations of a rectangle are generated and scored
+    at once with numpy (see _vector_placements).
+    """
+    vector_threshold = 16  # Smallest number of segments for which placements are generated with numpy
+
+    @staticmethod
+    def _placement_points_generator(skyline, width):
+
+        """Returns a generator for the x coordinates of all the placement
+        points on the skyline for a given rectangle (see Skyline)
+
+        Arguments:
+            skyline (tuple): Lists of left ends, tops and right ends of the segments
+            width (int, float): Rectangle width
+
+        Returns:
+            generator
+        """
+        lefts, _, rights = skyline
+        skyline_r = rights[-1]
+        skyline_l = lefts[0]
+
+        # Placements using skyline segment left point
+        ppointsl = (left for left in lefts if left+width <= skyline_r)
+
+        # Placements using skyline segment right point
+        ppointsr = (right-width for right in rights if right-width >= skyline_l)
+
+        # Merge positions
+        return heapq.merge(ppointsl, ppointsr)
+
+    def _generate_placements(self, width, height, overhang):
+
+        """
+        Generate the valid positions of the rectangle (see Skyline)
+
+        Arguments:
+            height (number): height of rectangle
+            width (number): width of rectangle
+            overhang (bool) : indicator of overhang permission
+
+        Yields:
+            tuple (x, y, left_skyline, right_skyline):
+                x, y: Bottom left corner of the rectangle in valid position
+                left_skyline: Index for the skyline under the rectangle left edge.
+                right_skyline: Index for the skyline under the rectangle right edte.
+        """
+        _, tops, rights = skyline = self._skyline
+
+        left_index = right_index = 0  # Left and right side skyline index
+        support_height = tops[0]
+        support_index = 0
+
+        # Highest top allowed and overhanging part of the rectangle that must be supported
+        max_top = self.height + int(overhang)*self.overhang_measure
+        overhang_part = int(overhang)*self.SBOT*height
+
+        for p in self._placement_points_generator(skyline, width):
+
+            # If Rectangle's right side changed segment, find new support
+            if p+width > rights[right_index]:
+                for right_index in range(right_index+1, len(tops)):
+                    if tops[right_index] >= support_height:
+                        support_index = right_index
+                        support_height = tops[right_index]
+                    if p+width <= rights[right_index]:
+                        break
+
+            # If left side changed segment.
+            if p >= rights[left_index]:
+                left_index += 1
+
+            # Find new support if the previous one was shifted out.
+            if support_index < left_index:
+                support_index = left_index
+                support_height = tops[left_index]
+                for i in range(left_index, right_index+1):
+                    if tops[i] >= support_height:
+                        support_index = i
+                        support_height = tops[i]
+
+            # Add point if there is enough room at the top
+            if support_height+height <= max_top and support_height + overhang_part <= self.height:
+                yield p, support_height, left_index, right_index
+
+    @staticmethod
+    def _merge_segment(lefts, tops, rights, left, top, right):
+        """
+        Appends a segment to the lists of the new skyline (merged with the last segment if they have the same top)
+        """
+        if len(tops) > 0 and tops[-1] == top:
+            rights[-1] = lefts[-1] + ((rights[-1] - lefts[-1]) + (right - left))
+        else:
+            lefts.append(left)
+            tops.append(top)
+            rights.append(right)
+
+    def _add_skyline(self, rect):
+
+        """
+        Arguments:
+            rect (Rectangle):
+        """
+        self._skyline = self._cover_segments(zip(*self._skyline), rect)
+
+    def _cover_segments(self, segments, rect):
+        """
+        Returns the lists of the segments given once covered by the rectangle (merged as in Skyline)
+
+        Arguments:
+            segments (iterable): (left, top, right) of consecutive segments
+            rect (Rectangle):
+        """
+        merge = self._merge_segment
+        lefts, tops, rights = [], [], []  # Skyline after adding new one
+        rect_left, rect_right, rect_top, rect_bottom = rect.left, rect.right, rect.top, rect.bottom
+
+        for left, top, right in segments:
+            if right <= rect_left or left >= rect_right:
+                merge(lefts, tops, rights, left, top, right)
+                continue
+
+            if left < rect_left < right:
+
+                # Skyline section partially under segment left
+                merge(lefts, tops, rights, left, top, left + (rect_left-left))
+                left, right = rect_left, rect_left + (right-rect_left)
+
+            if left < rect_right:
+                if left == rect_left:
+                    merge(lefts, tops, rights, rect_left, rect_top, rect_left + rect.width)
+
+                # Skyline section partially under segment right
+                if right > rect_right:
+                    merge(lefts, tops, rights, rect_right, top, rect_right + (right-rect_right))
+                    right = left + (rect_right-left)
+
+            if left >= rect_left and right <= rect_right:
+
+                # Skyline section fully under segment, account for wasted space
+                if self._waste_management and top < rect_bottom:
+                    self._waste.add_waste(left, top, right - left, rect_bottom - top)
+            else:
+                # Segment
+                merge(lefts, tops, rights, left, top, right)
+
+        return lefts, tops, rights
+
+    def _skyline_arrays(self):
+        """
+        Returns the lists of the skyline as numpy arrays, with a sparse table of the tops whose row k gives the
+        highest top of the 2**k segments starting at each segment (converted once for each state of the skyline).
+        The table is None when the right ends of the segments aren't increasing (a segment can be extended past its
+        neighbour when a rectangle edge is rounded), since the segments under a position can't be bisected then.
+        """
+        if self._arrays[0] is not self._skyline:
+            lefts, tops, rights = (np.array(values) for values in self._skyline)
+            table = None
+            if np.all(rights[:-1] < rights[1:]):
+                table = np.full((len(tops).bit_length(), len(tops)), tops.min())
+                table[0] = tops
+                for k in range(1, len(table)):
+                    half = 1 << (k - 1)
+                    table[k, :len(tops) - 2*half + 1] = np.maximum(table[k-1, :len(tops) - 2*half + 1],
+                                                                   table[k-1, half:len(tops) - half + 1])
+            self._arrays = (self._skyline, (lefts, tops, rights, table))
+
+        return self._arrays[1]
+
+    def _vector_placements(self, orientations, overhang):
+        """
+        Generates all the valid positions of the orientations of the rectangle with numpy, in the order of
+        _generate_placements (orientation after orientation).
+        The support height of a position is the highest top of the segments under the rectangle, which are the
+        segments from the first one ending after its left side to the first one ending at or after its right side,
+        found in the sparse table of the tops with two overlapping windows.
+
+        Arguments:
+            orientations (list): (width, height) of the rectangle for each orientation
+            overhang (bool) : indicator of overhang permission
+
+        Returns:
+            tuple of arrays: x coordinates, support heights, indexes of the orientations and indexes of the first
+            and the last segments under the rectangle of the positions
+        """
+        lefts, tops, rights, table = self._skyline_arrays()
+
+        # Placements using the left and the right points of the segments (merged as heapq.merge does)
+        points, orientation = [], []
+        for o, (width, height) in enumerate(orientations):
+            points += [lefts[lefts + width <= rights[-1]], (rights - width)[rights - width >= lefts[0]]]
+            orientation.append(np.full(len(points[-2]) + len(points[-1]), o))
+        points, orientation = np.concatenate(points), np.concatenate(orientation)
+        order = np.lexsort((points, orientation))
+        points, orientation = points[order], orientation[order]
+        width, height = np.array(orientations).T[:, orientation]
+
+        # We find the segments under the rectangle and its support height for every position
+        left_index = np.searchsorted(rights, points, side='right')
+        right_index = np.minimum(np.searchsorted(rights, points + width, side='left'), len(tops) - 1)
+        k = np.frexp(right_index - left_index + 1)[1] - 1
+        support = np.maximum(table[k, left_index], table[k, right_index - (1 << k) + 1])
+
+        # We keep the positions where there is enough room at the top
+        valid = (support + height <= self.height + int(overhang)*self.overhang_measure) & \
+                (support + int(overhang)*self.SBOT*height <= self.height)
+
+        return points[valid], support[valid], orientation[valid], left_index[valid], right_index[valid]
+
+    def _vector_fitness(self, x, support, width, height, left_index, right_index):
+        """
+        Computes the fitness of the positions returned by _vector_placements (top of the rectangle by default)
+        """
+        return support + height
+
+    def _vector_waste(self, x, support, width, left_index, right_index):
+        """
+        Computes the area wasted under the rectangle at the positions returned by _vector_placements, adding the
+        segments under the rectangle one after the other as _rect_waste does
+        """
+        lefts, tops, rights, _ = self._skyline_arrays()
+        waste = np.zeros(len(x), dtype=np.result_type(lefts, tops, rights, width))
+
+        for k in range(int((right_index - left_index).max(initial=0)) + 1):
+            i = np.minimum(left_index + k, right_index)
+            segment_waste = (np.minimum(x + width, rights[i]) - np.maximum(x, lefts[i])) * (support - tops[i])
+            waste += np.where(left_index + k <= right_index, segment_waste, 0)
+
+        return waste
+
+    def _select_position(self, width, height, overhang, rect_rotation):
+        """
+        Search for the placement with the best fitness for the rectangle (see Skyline)
+        """
+        if len(self._skyline[1]) < self.vector_threshold or self._skyline_arrays()[3] is None:
+            return super(ArraySkyline, self)._select_position(width, height, overhang, rect_rotation)
+
+        orientations = [(width, height)]
+        if self.rot and rect_rotation and width != height:
+            orientations.append((height, width))
+
+        # We keep the first position with the best fitness (the non rotated ones come first)
+        x, support, orientation, left_index, right_index = self._vector_placements(orientations, overhang)
+        if len(x) == 0:
+            return None, None
+
+        widths, heights = np.array(orientations).T[:, orientation]
+        fitness = self._vector_fitness(x, support, widths, heights, left_index, right_index)
+        i = np.argmin(fitness)
+        w, h = orientations[orientation[i]]
+        return Rectangle(x[i].item(), support[i].item(), w, h), fitness[i].item()
+
+    def _rect_waste(self, x, y, width, left_index, right_index):
+        """
+        Computes the area wasted under the rectangle placed at (x, y) (segments between the indexes given)
+        """
+        lefts, tops, rights = self._skyline
+        waste = 0
+        for i in range(left_index, right_index+1):
+            waste += (min(x+width, rights[i])-max(x, lefts[i])) * (y-tops[i])
+
+        return waste
+
+    def free_area(self, width, height, overhang=False):
+        """
+        Computes the area still available to place new rectangles (see Skyline)
+        """
+        top = self.height + int(overhang)*self.overhang_measure
+        free = sum((top - seg_top)*(right - left) for left, seg_top, right in zip(*self._skyline)
+                   if top - seg_top >= height)
+
+        if self._waste_management:
+            free += sum(section.area() for section in self._waste._sections
+                        if section.width >= width and section.height >= height)
+
+        return free
+
+    def covered_length(self, width_of_segment):
+        """
+        Computes the longest length reached by skyline segments of total width equal or greater than the width given
+
+        :param width_of_segment: segment width used for validation
+        :return: length (float) or None if the skyline is not wide enough
+        """
+        valid_skyline_length = 0
+
+        for left, top, right in sorted(zip(*self._skyline), key=operator.itemgetter(1), reverse=True):
+            valid_skyline_length += right - left
+
+            if valid_skyline_length >= width_of_segment:
+                return top
+
+        return None
+
+    def reset(self):
+        super(ArraySkyline, self).reset()
+        self._skyline = ([0], [0], [0 + self.width])
+        self._arrays = (None, None)  # Skyline converted by _skyline_arrays and its arrays
+
+
+class ArraySkylineBl(ArraySkyline, SkylineBl):
+    pass
+
+
+class ArraySkylineMwf(ArraySkyline, SkylineMwf):
+    """Implements Min Waste fit heuristic (see SkylineMwf)"""
+    def _rect_fitness(self, x, y, width, height, left_index, right_index):
+        return self._rect_waste(x, y, width, left_index, right_index)
+
+    def _vector_fitness(self, x, support, width, height, left_index, right_index):
+        return self._vector_waste(x, support, width, left_index, right_index)
+
+
+class ArraySkylineMwfl(ArraySkyline, SkylineMwfl):
+    """Implements Min Waste fit with low profile heuristic (see SkylineMwfl)"""
+    def _rect_fitness(self, x, y, width, height, left_index, right_index):
+        return self._rect_waste(x, y, width, left_index, right_index)*self.width*self.height+y+height
+
+    def _vector_fitness(self, x, support, width, height, left_index, right_index):
+        return self._vector_waste(x, support, width, left_index, right_index)*self.width*self.height+support+height
+
+
+class ArraySkylineBlWm(ArraySkyline, SkylineBlWm):
+    pass
+
+
+class ArraySkylineMwfWm(ArraySkylineMwf, SkylineMwfWm):
+    pass
+
+
+class ArraySkylineMwflWm(ArraySkylineMwfl, SkylineMwflWm):
+    pass
+
+
+class HeightTree(object):
+
+    """
+    Segment tree over the unit intervals [x, x+1) of a surface giving the highest top over an interval of x and
+    raising the tops of an interval, both in O(log width). An interval is raised with a tag on the nodes covering it
+    (tags are never pushed down), hence the top of a point is the highest tag among the nodes containing it.
+    """
+    __slots__ = ('size', 'highest', 'tags')
+
+    def __init__(self, width):
+        """
+        Arguments:
+            width (int): Number of unit intervals of the surface
+        """
+        self.size = 1
+        while self.size < width:
+            self.size <<= 1
+
+        self.highest = [0]*(2*self.size)  # Highest top in the interval of each node
+        self.tags = [0]*(2*self.size)  # Top given to the whole interval of each node
+
+    def copy(self):
+        tree = HeightTree(0)
+        tree.size, tree.highest, tree.tags = self.size, list(self.highest), list(self.tags)
+        return tree
+
+    def max(self, start, end):
+        """
+        Returns the highest top over [start, end)
+        """
+        highest, tags = self.highest, self.tags
+        start, end = start + self.size, end + self.size
+        top = 0
+
+        # Tags of the nodes above the ends of the interval
+        for i in (start >> 1, (end - 1) >> 1):
+            while i > 0:
+                if tags[i] > top:
+                    top = tags[i]
+                i >>= 1
+
+        # Nodes covering the interval
+        while start < end:
+            if start & 1:
+                if highest[start] > top:
+                    top = highest[start]
+                start += 1
+            if end & 1:
+                end -= 1
+                if highest[end] > top:
+                    top = highest[end]
+            start >>= 1
+            end >>= 1
+
+        return top
+
+    def raise_interval(self, start, end, top):
+        """
+        Raises the tops over [start, end) to the top given (if they are lower)
+        """
+        highest, tags = self.highest, self.tags
+        start, end = start + self.size, end + self.size
+        first, last = start, end - 1
+
+        # Nodes covering the interval
+        while start < end:
+            if start & 1:
+                highest[start], tags[start] = max(highest[start], top), max(tags[start], top)
+                start += 1
+            if end & 1:
+                end -= 1
+                highest[end], tags[end] = max(highest[end], top), max(tags[end], top)
+            start >>= 1
+            end >>= 1
+
+        # Nodes above the ends of the interval
+        for i in (first >> 1, last >> 1):
+            while i > 0:
+                highest[i] = max(highest[2*i], highest[2*i+1], tags[i])
+                i >>= 1
+
+
+class TreeSkyline(ArraySkyline):
+
+    """
+    Skyline searching the lowest positions of a rectangle from its lowest segments, with a segment tree over x giving
+    the support heights (see HeightTree), and replacing the segments under a rectangle added in place (found by
+    bisection) instead of rebuilding the skyline.
+
+    _skyline: lists of the segments as in ArraySkyline, but modified in place. The segments under a rectangle and
+    their neighbours are covered as in ArraySkyline, hence the coordinates and the placements are the same.
+    _tree: HeightTree of the tops of the segments. The tree needs integer x coordinates, the skyline drops it (until
+    its reset) when the width of the surface or of a rectangle isn't an integer and then generates the placements one
+    after the other as in ArraySkyline.
+    _lows: list of the (top, left end) of the segments sorted by top
+    """
+
+    def _lowest_position(self, width, height, overhang):
+
+        """
+        Finds the first of the lowest positions of the rectangle generated by _generate_placements.
+        The support height of a position is at least the top of the segment from which it is generated, hence the
+        segments are visited by increasing top (and x) until their top is higher than the lowest support height found.
+
+        Arguments:
+            width (number): width of rectangle (an integer)
+            height (number): height of rectangle
+            overhang (bool) : indicator of overhang permission
+
+        Returns:
+            tuple (x, y): Bottom left corner of the rectangle
+            None - Rectangle couldn't be placed
+        """
+        lefts, _, rights = self._skyline
+        tree, best = self._tree, None
+
+        for top, left in self._lows:
+
+            # Positions generated from higher segments can't be lower, and those of the segments at the same height
+            # can't be before the position found if the segments start too far after it
+            if best is not None and (top > best[0] or (top == best[0] and left - width >= best[1])):
+                break
+
+            # We evaluate the placements using the left and the right points of the segment
+            right = rights[bisect.bisect_left(lefts, left)]
+            for p in (left, right - width):
+                if 0 <= p and p + width <= self.width:
+                    support_height = tree.max(int(p), int(p + width))
+                    if best is None or (support_height, p) < best:
+                        best = (support_height, p)
+
+        # Other positions are at least as high, hence they can't be valid if this one isn't
+        if best is None or best[0] + height > self.height + int(overhang)*self.overhang_measure or \
+                best[0] + int(overhang)*self.SBOT*height > self.height:
+            return None
+
+        return best[1], best[0]
+
+    def _select_position(self, width, height, overhang, rect_rotation):
+        """
+        Search for the placement with the best fitness for the rectangle (see Skyline).
+        The fitness is the top of the rectangle, hence only the lowest positions are searched.
+        """
+        orientations = [(width, height)]
+        if self.rot and rect_rotation and width != height:
+            orientations.append((height, width))
+
+        # Without the tree, the placements are generated one after the other (never with numpy)
+        if self._tree is None or any(w != int(w) for w, h in orientations):
+            return super(ArraySkyline, self)._select_position(width, height, overhang, rect_rotation)
+
+        # We keep the first position with the best fitness (the non rotated ones come first)
+        best = None
+        for w, h in orientations:
+            position = self._lowest_position(w, h, overhang)
+            if position is not None and (best is None or position[1] + h < best[0]):
+                best = (position[1] + h, position[0], position[1], w, h)
+
+        if best is None:
+            return None, None
+
+        fitness, x, y, w, h = best
+        return Rectangle(x, y, w, h), fitness
+
+    def _add_skyline(self, rect):
+
+        """
+        Arguments:
+            rect (Rectangle):
+        """
+        lefts, tops, rights = self._skyline
+        tree, lows = self._tree, self._lows
+        rect_left, rect_right = rect.left, rect.right
+
+        # We find the segments under the rectangle and save them with their neighbours (that could be merged)
+        first = bisect.bisect_right(rights, rect_left)
+        end = bisect.bisect_left(lefts, rect_right)
+        start, stop = max(first - 1, 0), min(end + 1, len(lefts))
+        replaced = set(zip(tops[start:stop], lefts[start:stop]))
+
+        # We replace them by the segments covered by the rectangle
+        covered = self._cover_segments(zip(lefts[start:stop], tops[start:stop], rights[start:stop]), rect)
+        lefts[start:stop], tops[start:stop], rights[start:stop] = covered
+
+        # We raise the tree (dropped if the rectangle isn't placed at integer x coordinates)
+        if tree is not None and (rect_left != int(rect_left) or rect_right != int(rect_right)):
+            self._tree = None
+        elif tree is not None:
+            tree.raise_interval(int(rect_left), int(rect_right), rect.top)
+
+        # We replace the segments changed in the list sorted by top
+        stop = start + len(covered[0])
+        added = set(zip(tops[start:stop], lefts[start:stop]))
+        for segment in replaced - added:
+            del lows[bisect.bisect_left(lows, segment)]
+        for segment in added - replaced:
+            bisect.insort(lows, segment)
+
+    def checkpoint(self):
+        """
+        Saves the state of the surface such that it can be restored later (the lists of the segments and the tree
+        are copied since they are modified in place)
+        """
+        tree = self._tree if self._tree is None else self._tree.copy()
+        skyline = tuple(list(values) for values in self._skyline)
+        return len(self.rectangles), (skyline, tree, list(self._lows)), self.rot, self._waste.checkpoint()
+
+    def restore(self, state):
+        """
+        Restores a state of the surface saved by checkpoint (rectangles added since then are removed)
+        """
+        nb_of_rectangles, (skyline, tree, lows), self.rot, waste_state = state
+        self._skyline = tuple(list(values) for values in skyline)
+        self._tree, self._lows = tree if tree is None else tree.copy(), list(lows)
+        del self.rectangles[nb_of_rectangles:]
+        self._waste.restore(waste_state)
+
+    def reset(self):
+        super(TreeSkyline, self).reset()
+        self._tree = HeightTree(int(self.width)) if self.width == int(self.width) else None
+        self._lows = [(0, 0)]
+
+
+class TreeSkylineBl(TreeSkyline, SkylineBl):
+    pass
+
+
+class TreeSkylineBlWm(TreeSkyline, SkylineBlWm):
+    pass
@@ -17,6 +17,16 @@ class WasteManager(GuillotineBafMinas):
     def validate_packing(self):
         raise NotImplementedError
 
+    def checkpoint(self):
+        """Saves the rectangles placed and the free sections (never modified once created)"""
+        return len(self.rectangles), list(self._sections)
+
+    def restore(self, state):
+        """Restores a state saved by checkpoint"""
+        nb_of_rectangles, sections = state
+        del self.rectangles[nb_of_rectangles:]
+        self._sections = list(sections)
+
     def reset(self):
         super(WasteManager, self).reset()
         self._sections = []
@@ -39,6 +39,7 @@ drybox_sanity_check = True  # Activates drybox load validation
 printLoads = False  # Print created loads
 save_log_file = True  # Save log file of process results
 good_credit_for_max = False  # If set to true, allow only wishes with good credit to be used to satisfy max
+nb_of_build_processes = 1  # Number of processes building loads of independent p2ps at the same time (1 = serial)
 MinWarning = False  # Add yellow filling as warning when minimum is not satisfied for a p2p
 AutomaticRun = False  # set to True to automate code
 validation = False     # set to True to validate the results received after the process
@@ -134,6 +135,9 @@ def p2p_full_process():
     # Application of credit rule to satisfy max
     set_good_credit_for_max(good_credit_for_max)
 
+    # Number of processes building loads of independent p2ps at the same time
+    set_nb_of_build_processes(nb_of_build_processes)
+
     ####################################################################################################################
     #                                                 Excel Workbook declaration
     ####################################################################################################################
@@ -13,9 +13,14 @@ By : Nicolas Raymond
 from LoadBuilder import LoadBuilder, set_trailer_reference
 from InputOutput import *
 from numpy import savetxt
+from multiprocessing import Pool
+from inspect import isroutine
+from queue import Queue
 DATAInclude = []
 log_file = None
 good_credit_for_max = False
+nb_of_build_processes = 1  # Number of processes building loads of independent p2ps at the same time (1 = serial)
+build_pool = None  # Tuple with the number of processes and the pool building loads (created when needed)
 sharing_points_from = ['4100', '4125']
 shared_flatbed_53 = {'QTY': 2, 'POINT_FROM': sharing_points_from}  # Used to keep track of flat53 available
 residuals_counter = {}  # Use to keep track of the residuals of min and max among p2p with same POINT TO
@@ -282,7 +287,9 @@ class Parameters:
     def build_loads(self, loadbuilder_input, ranking, temporary_on_load, max_load, print_loads=False, **kwargs):
 
         """
-        Holds all procedures linked to the loadbuilding of a plant to plant
+        Holds all procedures linked to the loadbuilding of a plant to plant.
+        This is a generator (see run_p2p_steps) that yields the arguments of the LoadBuilder build when loads must
+        be built and receives its result.
 
         :param loadbuilder_input: list of lists that will be used to build loadbuilder input dataframe
         :param ranking: dictionary with rankings of crates
@@ -316,11 +323,15 @@ class Parameters:
         last_number_of_loads = len(self.LoadBuilder)
 
         # We build loads
-        result = self.LoadBuilder.build(input_dataframe, max_load, ranking=ranking, plot_load_done=print_loads)
+        result = yield input_dataframe, max_load, ranking, print_loads
 
         # We write the number of loads done
         log_file.writelines(['\n\n', 'NUMBER OF NEW LOADS : {}'.format(str(len(self.LoadBuilder) - last_number_of_loads))])
 
+        # We write if the loads were built with searches narrowed by the time budget of the LoadBuilder
+        if not self.LoadBuilder.build_complete:
+            log_file.writelines(['\n\n', '*** BUILD TRUNCATED BY TIME BUDGET ***'])
+
         # We update the number of common flatbed 53
         self.update_flatbed_53()
 
@@ -418,6 +429,21 @@ class FakeLogFile:
         pass
 
 
+class LogBuffer:
+    """
+    Log file that keeps the strings written in memory (used to write the log of p2ps built at the same time in the
+    order of the p2ps)
+    """
+    def __init__(self):
+        self.lines = []
+
+    def write(self, string):
+        self.lines.append(string)
+
+    def writelines(self, list_of_strings):
+        self.lines.extend(list_of_strings)
+
+
 def clean_p2p_history(expiration_date):
     """
     Delete all rows where import date was set before expiration date
@@ -901,41 +927,53 @@ def perfect_match_loads_construction(Parameters, ApprovedWishes, print_loads=Fal
     add_separator_line()
     log_file.writelines(['\n\n\n', 'PERFECT MATCH LOADS CONSTRUCTION', '\n\n\n'])
 
-    for param in Parameters:  # for all P2P in parameters
+    # We build loads for all P2P in parameters
+    run_p2p_steps([(param, perfect_match_p2p_loads(param, ApprovedWishes, print_loads, **kwargs))
+                   for param in Parameters], print_loads)
 
-        # We update LOADMIN and LOADMAX attribute
-        param.update_max()
+    # Store unallocated units in inv pool
+    throw_back_to_pool(ApprovedWishes)
 
-        # Initialization of empty list
-        temporary_on_load = []  # List to remember the INVobjs that will be sent to the LoadBuilder
-        loadbuilder_input = []  # List that will contain the data to build the frame we'll send to the LoadBuilder
 
-        # Initialization of an empty ranking dictionary
-        ranking = {}
+def perfect_match_p2p_loads(param, ApprovedWishes, print_loads=False, **kwargs):
+    """
+    Builds loads of a p2p after perfect match (generator, see run_p2p_steps)
 
-        # We loop through our wishes list
-        for wish in ApprovedWishes:
+    :param param: Parameters object of the p2p
+    :param ApprovedWishes: List of wishes approved
+    :param print_loads: bool indicating if we must plot loads done
+    """
+    # We update LOADMIN and LOADMAX attribute
+    param.update_max()
 
-            # If the wish is not fulfilled and his POINT FROM and POINT TO are corresponding with the param (p2p)
-            if wish.QUANTITY > 0 and wish.POINT_FROM == param.POINT_FROM and wish.SHIPPING_POINT == param.POINT_TO:
-                temporary_on_load.append(wish)
+    # Initialization of empty list
+    temporary_on_load = []  # List to remember the INVobjs that will be sent to the LoadBuilder
+    loadbuilder_input = []  # List that will contain the data to build the frame we'll send to the LoadBuilder
 
-                # Here we set QTY and NBR_PER_CRATE to 1 because each line of the wishlist correspond to
-                # one crate and not one unit! Must be done this way to avoid having getting to many size_code
-                # in the returning list of the LoadBuilder
-                loadbuilder_input.append(wish.get_loadbuilder_input_line())
+    # Initialization of an empty ranking dictionary
+    ranking = {}
 
-                # We add the ranking of the wish in the ranking dictionary
-                if wish.SIZE_DIMENSIONS in ranking:
-                    ranking[wish.SIZE_DIMENSIONS] += [wish.RANK]
-                else:
-                    ranking[wish.SIZE_DIMENSIONS] = [wish.RANK]
+    # We loop through our wishes list
+    for wish in ApprovedWishes:
 
-        param.build_loads(loadbuilder_input, ranking, temporary_on_load, param.LOADMAX, print_loads=print_loads, **kwargs)
-        param.add_residuals()
+        # If the wish is not fulfilled and his POINT FROM and POINT TO are corresponding with the param (p2p)
+        if wish.QUANTITY > 0 and wish.POINT_FROM == param.POINT_FROM and wish.SHIPPING_POINT == param.POINT_TO:
+            temporary_on_load.append(wish)
 
-    # Store unallocated units in inv pool
-    throw_back_to_pool(ApprovedWishes)
+            # Here we set QTY and NBR_PER_CRATE to 1 because each line of the wishlist correspond to
+            # one crate and not one unit! Must be done this way to avoid having getting to many size_code
+            # in the returning list of the LoadBuilder
+            loadbuilder_input.append(wish.get_loadbuilder_input_line())
+
+            # We add the ranking of the wish in the ranking dictionary
+            if wish.SIZE_DIMENSIONS in ranking:
+                ranking[wish.SIZE_DIMENSIONS] += [wish.RANK]
+            else:
+                ranking[wish.SIZE_DIMENSIONS] = [wish.RANK]
+
+    yield from param.build_loads(loadbuilder_input, ranking, temporary_on_load, param.LOADMAX,
+                                 print_loads=print_loads, **kwargs)
+    param.add_residuals()
 
 
 def satisfy_max_or_min(Wishes, Inventory, Parameters, satisfy_min=True, print_loads=False, **kwargs):
@@ -975,90 +1013,110 @@ def satisfy_max_or_min(Wishes, Inventory, Parameters, satisfy_min=True, print_lo
     else:
         filtered_wishlist = Wishes
 
-    # For each parameters in Parameters list
-    for param in Parameters:
+    # We try to satisfy the min or the max of each parameters in Parameters list
+    run_p2p_steps([(param, satisfy_p2p_max_or_min(param, filtered_wishlist, Inventory, satisfy_min, print_loads,
+                                                  **kwargs))
+                   for param in Parameters], print_loads)
 
-        # We update LOADMAX attribute
-        if not satisfy_min:
-            param.update_max()
 
-        # We save the current number of loads done
-        nb_loads_done = len(param.LoadBuilder)
+def satisfy_p2p_max_or_min(param, Wishes, Inventory, satisfy_min=True, print_loads=False, **kwargs):
+    """
+    Attributes wishes to a p2p in order to satisfy its min or its max value (generator, see run_p2p_steps)
 
-        if nb_loads_done < (check_min*param.LOADMIN + (1-check_min)*param.LOADMAX) or leftover_distribution:
+    :param param: Parameters object of the p2p
+    :param Wishes: List of wishes (list of Wish) that can be used
+    :param Inventory: List of INVobj
+    :param satisfy_min: (bool) if false -> we want to satisfy the max
+    :param print_loads: (bool) indicates if we plot each load or not
+    """
+    global residuals_counter
 
-            # Initialization of empty list
-            temporary_on_load = []  # List to remember the INVobj that will be sent to the LoadBuilder
-            load_builder_input = []  # List that will contain the data to build the frame we'll send to the LoadBuilder
+    # We look if we're distributing leftovers and if we want to satisfy min (1) or max (0)
+    leftover_distribution = kwargs.get('leftovers', False)
+    check_min = int(satisfy_min)
 
-            # Initialization of an empty ranking dictionary
-            ranking = {}
+    # We update LOADMAX attribute
+    if not satisfy_min:
+        param.update_max()
 
-            # We loop through our wishes list
-            for wish in filtered_wishlist:
+    # We save the current number of loads done
+    nb_loads_done = len(param.LoadBuilder)
 
-                # If the wish is not fulfilled and his POINT FROM and POINT TO are corresponding with the param (p2p)
-                if wish.QUANTITY > 0 and wish.POINT_FROM == param.POINT_FROM and wish.SHIPPING_POINT == param.POINT_TO:
+    if nb_loads_done < (check_min*param.LOADMIN + (1-check_min)*param.LOADMAX) or leftover_distribution:
 
-                    position = 0
+        # Initialization of empty list
+        temporary_on_load = []  # List to remember the INVobj that will be sent to the LoadBuilder
+        load_builder_input = []  # List that will contain the data to build the frame we'll send to the LoadBuilder
 
-                    # We look if there's inventory available to satisfy each unit needed for our wish
-                    for unit_needed in range(wish.QUANTITY):
+        # Initialization of an empty ranking dictionary
+        ranking = {}
 
-                        # For all pairs of (index, INVObj) of our list of INVObj
-                        for It, inv in enumerate(Inventory[position::]):
-                            if EquivalentPlantFrom(inv.POINT, wish.POINT_FROM) and\
-                                    inv.MATERIAL_NUMBER == wish.MATERIAL_NUMBER and inv.QUANTITY > 0 and\
-                                    (not inv.Future or (inv.Future and param.days_to > 0)):
+        # We loop through our wishes list
+        for wish in Wishes:
 
-                                inv.QUANTITY -= 1
-                                wish.INV_ITEMS.append(inv)
-                                position += It
-                                break  # no need to look further
+            # If the wish is not fulfilled and his POINT FROM and POINT TO are corresponding with the param (p2p)
+            if wish.QUANTITY > 0 and wish.POINT_FROM == param.POINT_FROM and wish.SHIPPING_POINT == param.POINT_TO:
 
-                    # We give back taken inv if there is not enough units to fulfill a wish (build a crate)
-                    if len(wish.INV_ITEMS) < wish.QUANTITY:  # We give back taken inv
-                        for invToGiveBack in wish.INV_ITEMS:
-                            invToGiveBack.QUANTITY += 1
-                        wish.INV_ITEMS = []
+                position = 0
 
-                    # If the wish can be satisfied
-                    else:
-                        temporary_on_load.append(wish)
+                # We look if there's inventory available to satisfy each unit needed for our wish
+                for unit_needed in range(wish.QUANTITY):
 
-                        # Here we set QTY and NBR_PER_CRATE to 1 because each line of the wishlist correspond to
-                        # one crate and not one unit! Must be done this way to avoid having getting to many size_code
-                        # in the returning list of the LoadBuilder
-                        load_builder_input.append(wish.get_loadbuilder_input_line())
+                    # For all pairs of (index, INVObj) of our list of INVObj
+                    for It, inv in enumerate(Inventory[position::]):
+                        if EquivalentPlantFrom(inv.POINT, wish.POINT_FROM) and\
+                                inv.MATERIAL_NUMBER == wish.MATERIAL_NUMBER and inv.QUANTITY > 0 and\
+                                (not inv.Future or (inv.Future and param.days_to > 0)):
 
-                        # We add the ranking of the wish in the ranking dictionary
-                        if wish.SIZE_DIMENSIONS in ranking:
-                            ranking[wish.SIZE_DIMENSIONS] += [wish.RANK]
-                        else:
-                            ranking[wish.SIZE_DIMENSIONS] = [wish.RANK]
+                            inv.QUANTITY -= 1
+                            wish.INV_ITEMS.append(inv)
+                            position += It
+                            break  # no need to look further
 
-            # We save the maximum number of loads that can be done
-            if leftover_distribution:
-                max_load = 0
-            else:
-                max_load = (check_min * min(param.LOADMIN, residuals_counter.get(param.POINT_TO, param.LOADMIN)) + (1 - check_min) * param.LOADMAX)
+                # We give back taken inv if there is not enough units to fulfill a wish (build a crate)
+                if len(wish.INV_ITEMS) < wish.QUANTITY:  # We give back taken inv
+                    for invToGiveBack in wish.INV_ITEMS:
+                        invToGiveBack.QUANTITY += 1
+                    wish.INV_ITEMS = []
 
-            # We build loads:
-            param.build_loads(load_builder_input, ranking, temporary_on_load, max_load, print_loads=print_loads, **kwargs)
+                # If the wish can be satisfied
+                else:
+                    temporary_on_load.append(wish)
 
-            # Store unallocated units in inv pool
-            throw_back_to_pool(temporary_on_load)
+                    # Here we set QTY and NBR_PER_CRATE to 1 because each line of the wishlist correspond to
+                    # one crate and not one unit! Must be done this way to avoid having getting to many size_code
+                    # in the returning list of the LoadBuilder
+                    load_builder_input.append(wish.get_loadbuilder_input_line())
 
-        # If we are satisfying max
-        if not satisfy_min:
-            param.add_residuals()
+                    # We add the ranking of the wish in the ranking dictionary
+                    if wish.SIZE_DIMENSIONS in ranking:
+                        ranking[wish.SIZE_DIMENSIONS] += [wish.RANK]
+                    else:
+                        ranking[wish.SIZE_DIMENSIONS] = [wish.RANK]
 
-        # Else we're satisfying min
+        # We save the maximum number of loads that can be done
+        if leftover_distribution:
+            max_load = 0
         else:
-            # If there's new load done we remove them from residuals counter
-            nb_new_loads = (len(param.LoadBuilder) - nb_loads_done)
-            if nb_new_loads > 0:
-                param.remove_residuals(nb_new_loads)
+            max_load = (check_min * min(param.LOADMIN, residuals_counter.get(param.POINT_TO, param.LOADMIN)) + (1 - check_min) * param.LOADMAX)
+
+        # We build loads:
+        yield from param.build_loads(load_builder_input, ranking, temporary_on_load, max_load,
+                                     print_loads=print_loads, **kwargs)
+
+        # Store unallocated units in inv pool
+        throw_back_to_pool(temporary_on_load)
+
+    # If we are satisfying max
+    if not satisfy_min:
+        param.add_residuals()
+
+    # Else we're satisfying min
+    else:
+        # If there's new load done we remove them from residuals counter
+        nb_new_loads = (len(param.LoadBuilder) - nb_loads_done)
+        if nb_new_loads > 0:
+            param.remove_residuals(nb_new_loads)
 
 
 def distribute_leftovers(Wishes, Inventory, Parameters):
@@ -1230,6 +1288,206 @@ def build_forecast_output_sending_function(wishlist, priority_table_connection,
     return save_wish_assignment
 
 
+def run_p2p_steps(steps, print_loads=False):
+    """
+    Runs the steps of p2ps. Each step is a generator doing all procedures of its p2p that yields the arguments of
+    the LoadBuilder build when loads must be built and receives the result of the build.
+
+    Steps are run one after the other in the order given if there's a single build process. Otherwise, coupled p2ps
+    form chains run in their order (see p2p_chains) while independent chains are run at the same time, with
+    their builds done by a pool of processes. Since p2ps of different chains don't share anything, the results are
+    the same as the serial run and the log of each p2p is written in the order of the p2ps.
+
+    :param steps: list of tuples with a Parameters object and its step, in priority order
+    :param print_loads: bool indicating if we plot loads done (the builds are then done in this process)
+    """
+    global log_file
+    chains = p2p_chains([param for param, step in steps])
+
+    # We run the steps one after the other if builds can't be done by other processes
+    if nb_of_build_processes <= 1 or len(chains) <= 1 or print_loads:
+        for param, step in steps:
+            request = next(step, None)
+            while request is not None:
+                input_dataframe, max_load, ranking, plot_load_done = request
+                result = param.LoadBuilder.build(input_dataframe, max_load, ranking=ranking,
+                                                 plot_load_done=plot_load_done)
+                request = send_to_step(step, result)
+        return
+
+    # We initialize a log buffer for each step, the position of the step run by each chain and a queue that receives
+    # the builds done by the pool (with the chain from which they come)
+    main_log_file = log_file
+    buffers = [LogBuffer() for _ in steps]
+    positions = [0]*len(chains)
+    builds_done = Queue()
+    nb_of_builds_running = 0
+
+    def run_until_build(c, result=None, first=True):
+
+        # We run the steps of the chain until one needs a build (that we send to the pool)
+        global log_file
+        nonlocal nb_of_builds_running
+
+        while positions[c] < len(chains[c]):
+            i = chains[c][positions[c]]
+            param, step = steps[i]
+
+            log_file = buffers[i]
+            request = next(step, None) if first else send_to_step(step, result)
+            log_file = main_log_file
+
+            if request is not None:
+                get_build_pool().apply_async(build_loads_in_process,
+                                             (param.LoadBuilder, load_builder_settings()) + request,
+                                             callback=lambda output: builds_done.put((c, output)),
+                                             error_callback=lambda error: builds_done.put((c, error)))
+                nb_of_builds_running += 1
+                return
+
+            positions[c] += 1
+            first = True
+
+    for c in range(len(chains)):
+        run_until_build(c)
+
+    # We give the result of each build done to its step and continue its chain
+    while nb_of_builds_running > 0:
+        c, output = builds_done.get()
+        nb_of_builds_running -= 1
+        if isinstance(output, Exception):
+
+            # We stop the builds still running and the steps of the p2ps before raising the error of the build
+            terminate_build_pool()
+            for param, step in steps:
+                step.close()
+            raise output
+
+        steps[chains[c][positions[c]]][0].LoadBuilder, result = output
+        run_until_build(c, result, first=False)
+
+    # We write the log of the steps in the order of the p2ps
+    for buffer in buffers:
+        log_file.writelines(buffer.lines)
+
+
+def send_to_step(step, result):
+    """
+    Sends the result of a build to a step of p2p (see run_p2p_steps)
+
+    :param step: generator of the p2p
+    :param result: result of the LoadBuilder build
+    :return: arguments of the next build needed by the step (None if the step is over)
+    """
+    try:
+        return step.send(result)
+    except StopIteration:
+        return None
+
+
+def p2p_chains(Parameters):
+    """
+    Groups coupled p2ps in chains. Two p2ps are coupled if they can take inventory at the same points or if one of
+    them shares flatbeds 53 and residuals of loads with other p2ps while the other shares them too or goes to the
+    same point
+
+    :param Parameters: List of Parameters
+    :return: list of chains (lists of positions of p2ps in Parameters, in increasing order)
+    """
+    # We save the points at which each p2p can take inventory and if it shares flatbeds 53 and residuals
+    points, sharing = [], []
+    for param in Parameters:
+        points.append(set([param.POINT_FROM] + [equiv.include for equiv in DATAInclude
+                                                if equiv.source == param.POINT_FROM]))
+        sharing.append(param.POINT_FROM in sharing_points_from or
+                       param.POINT_FROM in shared_flatbed_53['POINT_FROM'])
+
+    def coupled(i, j):
+        return not points[i].isdisjoint(points[j]) or (sharing[i] and sharing[j]) or \
+            ((sharing[i] or sharing[j]) and Parameters[i].POINT_TO == Parameters[j].POINT_TO)
+
+    # We merge the chains of the p2ps coupled with each p2p
+    chains = []
+    for i in range(len(Parameters)):
+        coupled_chains = [chain for chain in chains if any(coupled(i, j) for j in chain)]
+        chains = [chain for chain in chains if chain not in coupled_chains]
+        chains.append(sorted([i] + [j for chain in coupled_chains for j in chain]))
+
+    chains.sort()
+
+    return chains
+
+
+def load_builder_settings():
+    """
+    Returns the settings of the LoadBuilder (its class attributes) to send them to the build processes.
+    The builds of the processes evaluate their configurations with a single worker since a process of the build pool
+    can't create a pool of workers.
+
+    :return: dictionary
+    """
+    settings = {name: value for name, value in vars(LoadBuilder).items()
+                if not name.startswith('_') and not isroutine(value)}
+    settings['nb_of_workers'] = 1
+
+    return settings
+
+
+def build_loads_in_process(load_builder, settings, input_dataframe, max_load, ranking, plot_load_done):
+    """
+    Builds loads with a LoadBuilder in a process of the pool (see run_p2p_steps)
+
+    :param load_builder: LoadBuilder object of the p2p
+    :param settings: dictionary returned by load_builder_settings
+    :param input_dataframe: LoadBuilder input dataframe
+    :param max_load: maximum number of loads to do
+    :param ranking: dictionary with rankings of crates
+    :param plot_load_done: bool indicating if we should plot the loads done
+    :return: tuple with the LoadBuilder after the build and the result of the build
+    """
+    for name, value in settings.items():
+        setattr(LoadBuilder, name, value)
+
+    result = load_builder.build(input_dataframe, max_load, ranking=ranking, plot_load_done=plot_load_done)
+
+    return load_builder, result
+
+
+def get_build_pool():
+    """
+    Returns the pool of processes building loads (created again if the number of processes changed)
+
+    :return: Pool object
+    """
+    global build_pool
+    if build_pool is None or build_pool[0] != nb_of_build_processes:
+        if build_pool is not None:
+            build_pool[1].terminate()
+        build_pool = (nb_of_build_processes, Pool(nb_of_build_processes))
+
+    return build_pool[1]
+
+
+def terminate_build_pool():
+    """
+    Stops the processes building loads, even if builds are running (the pool is created again when needed)
+    """
+    global build_pool
+    if build_pool is not None:
+        build_pool[1].terminate()
+        build_pool[1].join()
+        build_pool = None
+
+
+def set_nb_of_build_processes(nb_of_processes):
+    """
+    Sets nb_of_build_processes global variable value
+    :param nb_of_processes: number of processes building loads of independent p2ps at the same time
+    """
+    global nb_of_build_processes
+    nb_of_build_processes = nb_of_processes
+
+
 def EquivalentPlantFrom(Point1, Point2):
     """" Point1 is shipping_point_from for inv, Point2 is shipping_point_from for wishlist
         Point1 is included in Point2                                                      """